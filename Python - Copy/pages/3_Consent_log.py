@@ -14,12 +14,21 @@ if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 # -------------------------------------------------------
 
+import io
+import csv
 import json
 from datetime import datetime, timedelta, date
 import streamlit as st
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
 
-from db import get_conn
+try:
+    import orjson  # optional C JSON codec; stdlib json is the fallback
+except ImportError:
+    orjson = None
+
+from db import get_readonly_conn
 
 # ---------------- Gate: require login ----------------
 uid = st.session_state.get("uid")
@@ -33,20 +42,61 @@ st.title("📜 Consent Log")
 
 # ---------------- Helpers ----------------
 def _load_distinct(col: str) -> list[str]:
-    with get_conn() as conn:
-        rows = conn.execute(f"SELECT DISTINCT {col} FROM access_logs ORDER BY {col} ASC").fetchall()
+    conn = get_readonly_conn()
+    rows = conn.execute(f"SELECT DISTINCT {col} FROM access_logs ORDER BY {col} ASC").fetchall()
     return [r[0] for r in rows if r and r[0]]
 
 def _safe_json_str(s: str | None) -> str:
     if not s:
         return ""
     try:
-        obj = json.loads(s)
         # Make a single-line compact view (nice in tables)
+        if orjson is not None:
+            return orjson.dumps(orjson.loads(s)).decode()
+        obj = json.loads(s)
         return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
     except Exception:
         return s
 
+def _compact_meta(raw: pd.Series) -> pd.Series:
+    # audit.log_event already stores compact JSON, so most rows can be shown
+    # as-is. Only re-serialize rows with whitespace or escapes (\uXXXX), which
+    # the roundtrip would actually change.
+    raw = raw.fillna("")
+    needs = raw.str.contains(r"[\s\\]", regex=True, na=False)
+    out = raw.copy()
+    if needs.any():
+        # plain loop over the object array: no pandas per-element dispatch
+        out.loc[needs] = [_safe_json_str(x) for x in raw.loc[needs].to_numpy()]
+    return out
+
+def _csv_buffer(df: pd.DataFrame, chunksize: int = 1000) -> io.BytesIO:
+    # pyarrow formats CSV in C. Convert and write one chunk of rows at a time
+    # so only a chunk's Arrow copy is alive at once; fall back to pandas for
+    # columns arrow can't convert (mixed objects). Arrow quotes the header and
+    # prints datetimes as "...00.000000000+0100", so the header is written the
+    # way pandas writes it and datetime columns are pre-formatted as to_csv
+    # would (astype(str) uses the same formatter).
+    buf = io.BytesIO()
+    try:
+        dt_cols = [c for c in df.columns if pd.api.types.is_datetime64_any_dtype(df[c])]
+        if dt_cols:
+            df = df.assign(**{c: df[c].astype(str).where(df[c].notna(), None) for c in dt_cols})
+        schema = pa.Schema.from_pandas(df, preserve_index=False)
+        header = io.StringIO()
+        csv.writer(header, lineterminator="\n").writerow(df.columns)
+        buf.write(header.getvalue().encode("utf-8"))
+        opts = pa_csv.WriteOptions(include_header=False)
+        with pa_csv.CSVWriter(buf, schema, write_options=opts) as writer:
+            for start in range(0, len(df), chunksize):
+                chunk = df.iloc[start:start + chunksize]
+                writer.write_batch(pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False))
+    except (pa.ArrowException, TypeError, ValueError):
+        buf = io.BytesIO()
+        df.to_csv(buf, index=False, encoding="utf-8", chunksize=chunksize)
+    buf.seek(0)
+    return buf
+
 def _default_start():
     # show last 30 days by default
     return (datetime.utcnow() - timedelta(days=30)).date()
@@ -85,13 +135,13 @@ if isinstance(end_d, date):
     where.append("DATE(l.at) <= DATE(?)")
     params.append(end_d.isoformat())
 
-# Role filter
-if roles:
+# Role filter (skipped when every role is selected, the default)
+if roles and set(roles) != set(roles_all):
     where.append(f"l.actor_role IN ({','.join('?' for _ in roles)})")
     params.extend(roles)
 
-# Action filter
-if actions:
+# Action filter (skipped when every action is selected)
+if actions and set(actions) != set(actions_all):
     where.append(f"l.action IN ({','.join('?' for _ in actions)})")
     params.extend(actions)
 
@@ -123,8 +173,8 @@ LIMIT ?
 params_with_limit = params + [int(limit)]
 
 # ---------------- Query + format ----------------
-with get_conn() as conn:
-    rows = conn.execute(sql, params_with_limit).fetchall()
+conn = get_readonly_conn()
+rows = conn.execute(sql, params_with_limit).fetchall()
 
 if not rows:
     st.info("No log entries match your filters.")
@@ -137,7 +187,7 @@ df = pd.DataFrame(rows, columns=[
 ])
 
 # Pretty meta & helpful derived columns
-df["meta"] = df["meta_raw"].map(_safe_json_str)
+df["meta"] = _compact_meta(df["meta_raw"])
 df.drop(columns=["meta_raw"], inplace=True)
 
 # Quick counts at the top
@@ -158,7 +208,7 @@ st.dataframe(
 )
 
 # CSV export
-csv = df.to_csv(index=False).encode("utf-8")
+csv = _csv_buffer(df)
 st.download_button(
     "⬇️ Download CSV",
     data=csv,
@@ -169,5 +219,5 @@ st.download_button(
 
 # Optional: simple action frequency chart (enable if you want)
 with st.expander("See action counts"):
-    cnt = df.groupby("action").size().reset_index(name="count").sort_values("count", ascending=False)
-    st.bar_chart(cnt.set_index("action"))
+    cnt = df["action"].value_counts().rename("count")
+    st.bar_chart(cnt)
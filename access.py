@@ -15,11 +15,17 @@ Policies
 
 Use assert_can_access(...) to raise an error and optionally log.
 
+can_access_cached(...) memoizes can_access for a few seconds so list->download
+loops don't re-run the same probes; writers that change visibility or grants
+call invalidate_access_cache() once their transaction has committed, so their
+own changes are seen immediately.
+
 All DB I/O is within a single connection (pass conn to reuse transactions).
 """
 
 from __future__ import annotations
 import time
+from collections import OrderedDict
 from typing import Optional, Tuple, Dict, Any
 import sqlite3
 
@@ -29,6 +35,13 @@ from audit import log_event
 TODAY = lambda: time.strftime("%Y-%m-%d")
 NOW   = lambda: time.strftime("%Y-%m-%d %H:%M:%S")
 
+ACCESS_CACHE_TTL = 5.0    # seconds a memoized decision stays valid
+ACCESS_CACHE_SIZE = 1024
+
+# (dataset_id, actor_id, actor_role, purpose) -> (epoch, stored_at, result)
+_access_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_access_epoch = 0
+
 
 def _fetch_dataset(conn: sqlite3.Connection, dataset_id: int):
     row = conn.execute(
@@ -136,6 +149,51 @@ def can_access(
             conn.close()
 
 
+def invalidate_access_cache() -> None:
+    """
+    Forget memoized decisions. Call after a visibility or grant change has
+    COMMITTED: a reader that ran before the commit read the old row and would
+    otherwise cache it under the new epoch.
+    """
+    global _access_epoch
+    _access_epoch += 1
+    _access_cache.clear()
+
+
+def can_access_cached(
+    *,
+    dataset_id: int,
+    actor_id: Optional[int],
+    actor_role: Optional[str],
+    purpose: Optional[str] = None,
+    conn: Optional[sqlite3.Connection] = None,
+) -> Tuple[bool, str, Dict[str, Any]]:
+    """
+    can_access with a short-lived LRU in front of it. Entries expire after
+    ACCESS_CACHE_TTL (bounds staleness from other processes and grant expiry)
+    and are dropped whenever invalidate_access_cache() bumps the epoch.
+    """
+    key = (dataset_id, actor_id, actor_role, purpose)
+    now = time.monotonic()
+    hit = _access_cache.get(key)
+    if hit is not None:
+        epoch, stored_at, (allowed, reason, grant) = hit
+        if epoch == _access_epoch and now - stored_at < ACCESS_CACHE_TTL:
+            _access_cache.move_to_end(key)
+            return allowed, reason, dict(grant)
+
+    epoch = _access_epoch
+    allowed, reason, grant = can_access(
+        dataset_id=dataset_id, actor_id=actor_id, actor_role=actor_role, purpose=purpose, conn=conn
+    )
+    if epoch == _access_epoch:  # not invalidated while we were reading
+        _access_cache[key] = (epoch, now, (allowed, reason, dict(grant)))
+        _access_cache.move_to_end(key)
+        while len(_access_cache) > ACCESS_CACHE_SIZE:
+            _access_cache.popitem(last=False)
+    return allowed, reason, grant
+
+
 def assert_can_access(
     *,
     dataset_id: int,
@@ -4,6 +4,8 @@ audit.py — Centralized audit logging for access_logs table.
 Features
 --------
 - log_event(...) inserts into access_logs with validated action & role
+- log_events(...) batch-inserts many rows with one executemany
+- AuditBatcher: write-behind queue that flushes batches on a background thread
 - Convenience wrappers for common actions:
     log_upload, log_permissions_update, log_request_access,
     log_grant, log_revoke, log_download, log_denied,
@@ -12,8 +14,12 @@ Features
 
 import json
 import time
+import queue
+import atexit
+import logging
 import sqlite3
-from typing import Optional, Mapping, Any
+import threading
+from typing import Optional, Mapping, Any, Iterable, Tuple, Callable, List
 
 from db import get_conn
 
@@ -38,9 +44,30 @@ ALLOWED_ACTIONS = {
 
 ALLOWED_ROLES = {"user", "org", "admin"}
 
+_INSERT_LOG_SQL = """
+    INSERT INTO access_logs(dataset_id, actor_id, actor_role, action, meta, at)
+    VALUES(?,?,?,?,?,?)
+"""
+
 # -------------------------------------------------------------------
-# Core function
+# Core functions
 # -------------------------------------------------------------------
+def _validate(action: str, actor_role: str) -> tuple[str, str]:
+    action = (action or "").strip()
+    if action not in ALLOWED_ACTIONS:
+        raise ValueError(f"Invalid action '{action}'. Allowed: {sorted(ALLOWED_ACTIONS)}")
+
+    actor_role = (actor_role or "").strip()
+    if actor_role not in ALLOWED_ROLES:
+        raise ValueError(f"Invalid actor_role '{actor_role}'. Allowed: {sorted(ALLOWED_ROLES)}")
+    return action, actor_role
+
+def _payload(meta: Optional[Mapping[str, Any]]) -> str:
+    """Compact JSON for meta; plain dicts are serialized without a copy."""
+    if not meta:
+        return "{}"
+    return json.dumps(meta if type(meta) is dict else dict(meta), separators=(",", ":"))
+
 def log_event(
     dataset_id: int,
     actor_id: int,
@@ -53,26 +80,114 @@ def log_event(
     Insert a row into access_logs.
     If `conn` is provided, reuse it (avoids 'database is locked').
     """
-    action = (action or "").strip()
-    if action not in ALLOWED_ACTIONS:
-        raise ValueError(f"Invalid action '{action}'. Allowed: {sorted(ALLOWED_ACTIONS)}")
+    action, actor_role = _validate(action, actor_role)
 
-    actor_role = (actor_role or "").strip()
-    if actor_role not in ALLOWED_ROLES:
-        raise ValueError(f"Invalid actor_role '{actor_role}'. Allowed: {sorted(ALLOWED_ROLES)}")
+    params = (dataset_id, actor_id, actor_role, action, _payload(meta), NOW())
+
+    if conn is not None:
+        conn.execute(_INSERT_LOG_SQL, params)
+    else:
+        with get_conn() as c:
+            c.execute(_INSERT_LOG_SQL, params)
 
-    payload = json.dumps(dict(meta or {}), separators=(",", ":"))
-    sql = """
-        INSERT INTO access_logs(dataset_id, actor_id, actor_role, action, meta, at)
-        VALUES(?,?,?,?,?,?)
+def log_events(
+    events: Iterable[Tuple[int, int, str, str, Optional[Mapping[str, Any]]]],
+    conn: Optional[sqlite3.Connection] = None,
+) -> None:
     """
-    params = (dataset_id, actor_id, actor_role, action, payload, NOW())
+    Insert many (dataset_id, actor_id, actor_role, action, meta) rows with one
+    executemany. Every row is validated before anything is written.
+    """
+    at = NOW()
+    rows = []
+    for dataset_id, actor_id, actor_role, action, meta in events:
+        action, actor_role = _validate(action, actor_role)
+        rows.append((dataset_id, actor_id, actor_role, action, _payload(meta), at))
+    if not rows:
+        return
 
     if conn is not None:
-        conn.execute(sql, params)
+        conn.executemany(_INSERT_LOG_SQL, rows)
     else:
         with get_conn() as c:
-            c.execute(sql, params)
+            c.executemany(_INSERT_LOG_SQL, rows)
+
+# -------------------------------------------------------------------
+# Write-behind batching
+# -------------------------------------------------------------------
+class AuditBatcher:
+    """
+    Write-behind queue for bookkeeping that the caller doesn't need to wait on.
+
+    enqueue(item) returns immediately. A single daemon thread, started on first
+    use, collects items until `max_batch` are queued or `max_delay` seconds
+    have passed, then calls flush(conn, items) inside one BEGIN IMMEDIATE
+    transaction on its own connection. If a batch fails, each item is retried
+    in its own transaction so one bad row doesn't drop the rest. Pending items
+    are drained at interpreter exit.
+    """
+
+    def __init__(
+        self,
+        flush: Callable[[sqlite3.Connection, List[Any]], None],
+        *,
+        max_batch: int = 200,
+        max_delay: float = 0.05,
+    ) -> None:
+        self._flush = flush
+        self._max_batch = max_batch
+        self._max_delay = max_delay
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def enqueue(self, item: Any) -> None:
+        if self._thread is None:
+            self._start()
+        self._queue.put(item)
+
+    def drain(self) -> None:
+        """Block until everything enqueued so far has been written."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+                self._thread.start()
+                atexit.register(self.drain)
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self._max_delay
+            while len(batch) < self._max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._write(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _write(self, batch: List[Any]) -> None:
+        try:
+            with get_conn() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                self._flush(conn, batch)
+            return
+        except Exception:
+            if len(batch) == 1:
+                logging.getLogger(__name__).exception("audit write-behind dropped 1 item")
+                return
+        for item in batch:
+            self._write([item])
 
 # -------------------------------------------------------------------
 # Convenience wrappers
@@ -1,31 +1,71 @@
 # db.py
 import sqlite3
 from contextlib import contextmanager
+from functools import lru_cache
 
 DB_PATH = "pds.db"
 
-PRAGMAS = [
+# journal_mode is stored in the database file, so it only needs setting once
+# per process; the rest are per-connection and applied on every connect.
+PERSISTENT_PRAGMAS = [
     ("journal_mode", "WAL"),     # allows readers while writing
+]
+
+PRAGMAS = [
     ("synchronous", "NORMAL"),   # good perf vs safety for prototypes
     ("foreign_keys", "ON"),
     ("busy_timeout", "5000"),    # wait up to 5s if the db is busy
     ("temp_store", "MEMORY"),
+    ("mmap_size", "268435456"),  # 256 MB memory-mapped reads
+    ("cache_size", "-65536"),    # up to 64 MB page cache (allocated lazily)
 ]
 
-def _apply_pragmas(conn: sqlite3.Connection) -> None:
+# Read-only handle: journal mode is persisted by the writers, so only tune reads
+READONLY_PRAGMAS = [
+    ("busy_timeout", "5000"),
+    ("temp_store", "MEMORY"),
+    ("mmap_size", "268435456"),  # 256 MB memory-mapped reads
+    ("cache_size", "-65536"),    # 64 MB page cache for the log joins/sorts
+]
+
+def _apply_pragmas(conn: sqlite3.Connection, pragmas=PRAGMAS) -> None:
     cur = conn.cursor()
-    for k, v in PRAGMAS:
+    for k, v in pragmas:
         cur.execute(f"PRAGMA {k}={v};")
     cur.close()
 
+_persistent_applied = False
+
 @contextmanager
 def get_conn():
-    # check_same_thread=False so Streamlit threads can use it
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    global _persistent_applied
+    # check_same_thread=False so Streamlit threads can use it; the larger
+    # statement cache keeps every static query in storage/rewards prepared
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, cached_statements=256)
+    if not _persistent_applied:
+        _apply_pragmas(conn, PERSISTENT_PRAGMAS)
+        _persistent_applied = True
     _apply_pragmas(conn)
     try:
         yield conn
         conn.commit()
+        # Let SQLite refresh planner stats for tables this connection used;
+        # usually a no-op, and cheap enough for short-lived connections.
+        try:
+            conn.execute("PRAGMA optimize;")
+        except sqlite3.Error:
+            pass
     finally:
         conn.close()
 
+@lru_cache(maxsize=None)
+def get_readonly_conn() -> sqlite3.Connection:
+    """
+    Shared read-only connection for read-heavy pages (e.g. the consent log).
+    Opened once per process and reused across reruns; never write through it.
+    """
+    # Larger statement cache: the consent log binds many distinct filter shapes
+    conn = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True, check_same_thread=False,
+                           cached_statements=256)
+    _apply_pragmas(conn, READONLY_PRAGMAS)
+    return conn
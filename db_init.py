@@ -68,6 +68,18 @@ CREATE TABLE IF NOT EXISTS datasets(
 );
 """
 
+# Large uploads are stored as separately encrypted ~1 MiB chunks so neither
+# side ever holds a second full-size copy; datasets.content_enc is then empty.
+DATASET_CHUNKS_SQL = """
+CREATE TABLE IF NOT EXISTS dataset_chunks(
+  dataset_id INTEGER NOT NULL,
+  seq INTEGER NOT NULL,
+  content_enc BLOB NOT NULL,
+  PRIMARY KEY(dataset_id, seq),
+  FOREIGN KEY(dataset_id) REFERENCES datasets(id) ON DELETE CASCADE
+);
+"""
+
 PERMISSIONS_SQL = """
 CREATE TABLE IF NOT EXISTS permissions(
   id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -122,9 +134,18 @@ INDEXES_SQL = [
     "CREATE INDEX IF NOT EXISTS idx_datasets_owner      ON datasets(owner_id);",
     "CREATE INDEX IF NOT EXISTS idx_datasets_visibility ON datasets(visibility);",
     "CREATE UNIQUE INDEX IF NOT EXISTS uniq_owner_name_ver ON datasets(owner_id, name, version);",
+    # list_my_latest (ROW_NUMBER per name, newest version first) / save_dataset's MAX(version)
+    "CREATE INDEX IF NOT EXISTS idx_datasets_owner_name_ver_desc ON datasets(owner_id, name, version DESC);",
     "CREATE INDEX IF NOT EXISTS idx_permissions_ds ON permissions(dataset_id);",
     "CREATE INDEX IF NOT EXISTS idx_permissions_org ON permissions(org_id);",
     "CREATE INDEX IF NOT EXISTS idx_logs_ds_time   ON access_logs(dataset_id, at);",
+    # consent log ORDER BY at DESC, id DESC with keyset (seek) paging and the
+    # date range
+    "CREATE INDEX IF NOT EXISTS idx_logs_at_id ON access_logs(at DESC, id DESC);",
+    # list_trusted_org_ids / set_trusted_orgs: covering (index-only) lookups
+    "CREATE INDEX IF NOT EXISTS idx_permissions_ds_allow_status_org ON permissions(dataset_id, allow, status, org_id);",
+    # list_my_requests: org + status filter, dataset_id for the join
+    "CREATE INDEX IF NOT EXISTS idx_permissions_org_status_ds ON permissions(org_id, status, dataset_id);",
     "CREATE INDEX IF NOT EXISTS idx_rewards_owner  ON rewards(owner_id);",
 ]
 
@@ -155,6 +176,109 @@ TRIGGERS_SQL = [
     """,
 ]
 
+# Consent-log search index. Trigram FTS5 keeps "contains" search semantics
+# (any substring of 3+ chars) while avoiding leading-% LIKE scans. Rows leave
+# access_logs when their dataset or actor is deleted (ON DELETE CASCADE), so
+# the table stores its own copy of the text: FTS5 on this SQLite can only
+# delete a contentless row given its original values, which are gone by then.
+LOGS_FTS_SQL = """
+CREATE VIRTUAL TABLE IF NOT EXISTS logs_fts USING fts5(
+  dataset_name, actor_name, actor_email, meta,
+  tokenize='trigram'
+);
+"""
+
+LOGS_FTS_TRIGGER_SQL = """
+CREATE TRIGGER IF NOT EXISTS trg_access_logs_fts AFTER INSERT ON access_logs
+BEGIN
+  INSERT INTO logs_fts(rowid, dataset_name, actor_name, actor_email, meta)
+  VALUES (
+    NEW.id,
+    (SELECT name  FROM datasets WHERE id = NEW.dataset_id),
+    (SELECT name  FROM users    WHERE id = NEW.actor_id),
+    (SELECT email FROM users    WHERE id = NEW.actor_id),
+    NEW.meta
+  );
+END;
+"""
+
+LOGS_FTS_DELETE_TRIGGER_SQL = """
+CREATE TRIGGER IF NOT EXISTS trg_access_logs_fts_del AFTER DELETE ON access_logs
+BEGIN
+  DELETE FROM logs_fts WHERE rowid = OLD.id;
+END;
+"""
+
+LOGS_FTS_BACKFILL_SQL = """
+INSERT INTO logs_fts(rowid, dataset_name, actor_name, actor_email, meta)
+SELECT l.id, d.name, a.name, a.email, l.meta
+FROM access_logs l
+LEFT JOIN users    a ON a.id = l.actor_id
+LEFT JOIN datasets d ON d.id = l.dataset_id;
+"""
+
+# One access reward per (org, dataset, day), enforced by the database so the
+# reward path can INSERT ... ON CONFLICT DO NOTHING instead of SELECT-then-INSERT.
+# Manual credits (other reasons) are not limited. The date column depends on
+# which rewards schema is installed (db_init vs db_migrate_add_rewards).
+# Older databases can already hold several access rewards for one key (the
+# pre-index check compared local stamps with UTC DATE('now')); those rows are
+# left as they are and kept out of the index by the id cutoff, which is the
+# highest id in any duplicated key at build time (0 when there are none).
+REWARDS_DAILY_INDEX_SQL = """
+CREATE UNIQUE INDEX IF NOT EXISTS uniq_rewards_daily
+  ON rewards(org_id, dataset_id, DATE({date_col}))
+  WHERE reason LIKE 'org_access:%' AND id > {cutoff};
+"""
+
+REWARDS_DAILY_CUTOFF_SQL = """
+SELECT COALESCE(MAX(max_id), 0) FROM (
+  SELECT MAX(id) AS max_id FROM rewards
+  WHERE reason LIKE 'org_access:%'
+  GROUP BY org_id, dataset_id, DATE({date_col})
+  HAVING COUNT(*) > 1
+)
+"""
+
+# Lookup index for rewards._has_credit_today (the path used when the unique
+# index above could not be created); matches its DATE(<date col>) expression.
+REWARDS_DEDUP_INDEX_SQL = """
+CREATE INDEX IF NOT EXISTS idx_rewards_dedup
+  ON rewards(dataset_id, org_id, DATE({date_col}));
+"""
+
+def ensure_rewards_daily_index(conn: sqlite3.Connection) -> None:
+    """
+    Create the daily-dedup indexes for whichever rewards schema exists.
+    uniq_rewards_daily is built once, covering only rows after any existing
+    duplicates (REWARDS_DAILY_CUTOFF_SQL), so the build can't fail and later
+    init_schema() calls skip it. Existing rows are never modified.
+    """
+    cols = table_columns(conn, "rewards")
+    date_col = "at" if "at" in cols else ("created_at" if "created_at" in cols else None)
+    if not date_col:
+        return
+    exec_many(conn, [REWARDS_DEDUP_INDEX_SQL.format(date_col=date_col)])
+    if conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='index' AND name='uniq_rewards_daily'"
+    ).fetchone():
+        return
+    cutoff = int(conn.execute(REWARDS_DAILY_CUTOFF_SQL.format(date_col=date_col)).fetchone()[0])
+    exec_many(conn, [REWARDS_DAILY_INDEX_SQL.format(date_col=date_col, cutoff=cutoff)])
+
+def ensure_logs_fts(conn: sqlite3.Connection) -> None:
+    """Create the consent-log search index, backfilling rows logged before it existed."""
+    row = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type='table' AND name='logs_fts'"
+    ).fetchone()
+    existed = row is not None
+    pre = []
+    if existed and "content=''" in row[0]:
+        # earlier contentless build: can't delete from it, so rebuild
+        pre, existed = ["DROP TABLE logs_fts;"], False
+    exec_many(conn, pre + [LOGS_FTS_SQL, LOGS_FTS_TRIGGER_SQL, LOGS_FTS_DELETE_TRIGGER_SQL]
+              + ([] if existed else [LOGS_FTS_BACKFILL_SQL]))
+
 # -------------------------
 # Initialization
 # -------------------------
@@ -162,7 +286,7 @@ TRIGGERS_SQL = [
 def init_schema() -> None:
     with get_conn() as conn:
         # Base tables
-        exec_many(conn, [USERS_SQL, DATASETS_SQL, PERMISSIONS_SQL, ACCESS_LOGS_SQL, REWARDS_SQL])
+        exec_many(conn, [USERS_SQL, DATASETS_SQL, DATASET_CHUNKS_SQL, PERMISSIONS_SQL, ACCESS_LOGS_SQL, REWARDS_SQL])
 
         # Backfill columns for users (if table existed previously)
         ensure_column(conn, "users", "first_name", "TEXT")
@@ -170,9 +294,24 @@ def init_schema() -> None:
         ensure_column(conn, "users", "dob",        "TEXT")  # store as YYYY-MM-DD
         ensure_column(conn, "users", "last_login", "TEXT")
 
+        # Plaintext size, recorded on upload (NULL for older datasets)
+        ensure_column(conn, "datasets", "size_bytes", "INTEGER")
+
         # Indexes, view, triggers
         exec_many(conn, INDEXES_SQL + [VIEW_SQL] + TRIGGERS_SQL)
 
+        # Full-text search for the consent log
+        ensure_logs_fts(conn)
+
+        # Daily access-reward dedup
+        ensure_rewards_daily_index(conn)
+
+        # Initial planner statistics; PRAGMA optimize in get_conn keeps them fresh
+        if not conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='sqlite_stat1'"
+        ).fetchone():
+            exec_many(conn, ["ANALYZE;"])
+
 def seed_demo() -> None:
     """Optional: create one demo user and one demo org (password = 'Password123')."""
     from security import hash_password
@@ -1,5 +1,6 @@
 # db_migrate_add_rewards.py
 from db import get_conn
+from db_init import ensure_rewards_daily_index
 
 DDL = """
 CREATE TABLE IF NOT EXISTS rewards(
@@ -22,4 +23,5 @@ with get_conn() as conn:
     for stmt in filter(None, (s.strip() for s in DDL.split(";"))):
         if stmt:
             conn.execute(stmt)
+    ensure_rewards_daily_index(conn)
 print("✅ rewards table ready")
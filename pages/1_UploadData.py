@@ -23,6 +23,7 @@ from storage import (
     list_versions,
     get_dataset_for_download,  # secure + audited (+ rewards when orgs download)
     change_visibility,
+    VisibilityConflictError,
 )
 
 # ------------------ App config + theme tweaks ------------------
@@ -189,6 +190,7 @@ with st.container(border=True):
                         description=desc,
                         visibility=visibility,
                     )
+                    st.cache_data.clear()  # other pages cache dataset listings
                     st.success(f"Uploaded **{uploaded.name}** as version **v{ver}** ({visibility}).")
                     st.rerun()
                 except Exception as e:
@@ -231,10 +233,13 @@ else:
                     try:
                         ok_update = change_visibility(owner_id=uid, dataset_id=ds_id, new_visibility=new_vis)
                         if ok_update:
+                            st.cache_data.clear()
                             st.success(f"Visibility updated to {new_vis}.")
                             st.rerun()
                         else:
-                            st.error("Could not update visibility (not owner or dataset missing).")
+                            st.error("Could not update visibility (dataset not found or not yours).")
+                    except VisibilityConflictError:
+                        st.warning("Someone else changed this dataset's visibility at the same time. Reload and try again.")
                     except Exception as e:
                         st.error(f"Update failed: {e}")
 
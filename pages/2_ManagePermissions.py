@@ -37,7 +37,7 @@ ROOT = pathlib.Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-from storage import list_my_latest, change_visibility
+from storage import list_my_latest, change_visibility, VisibilityConflictError
 from permissions import (
     list_org_directory,
     list_trusted_org_ids,
@@ -47,19 +47,22 @@ from permissions import (
 
 NOW = lambda: time.strftime("%Y-%m-%d %H:%M:%S")
 
+_SIDEBAR_CSS = """
+<style>
+    [data-testid="stSidebar"] { background-color: #0D2847; color: white; }
+    [data-testid="stSidebar"] * { color: white !important; }
+</style>
+"""
+
+# Above this many orgs the trusted-org multiselect gets a text filter
+ORG_FILTER_THRESHOLD = 200
+ORG_FILTER_MAX_SHOWN = 50
+
 # -------------------------- App config -------------------------------
 st.set_page_config(page_title="Manage Permissions", page_icon="🔐", layout="wide")
 
 # Sidebar theming
-st.markdown(
-    """
-    <style>
-        [data-testid="stSidebar"] { background-color: #0D2847; color: white; }
-        [data-testid="stSidebar"] * { color: white !important; }
-    </style>
-    """,
-    unsafe_allow_html=True
-)
+st.markdown(_SIDEBAR_CSS, unsafe_allow_html=True)
 
 # -------------------------- Auth gate --------------------------------
 uid = st.session_state.get("uid")
@@ -74,27 +77,49 @@ st.caption(f"Logged in as **{st.session_state.get('name','')}**")
 def safe_first(seq, default=None):
     return seq[0] if seq else default
 
-def dataset_rows_for_user(user_id: int):
-    """Rows: (id, name, version, visibility, created_at)"""
-    try:
-        return list_my_latest(user_id)
-    except Exception as e:
-        st.error(f"Could not load your datasets: {e}")
-        return []
+# Every widget interaction reruns this script; cache the directory/listing
+# reads briefly and clear them explicitly after our own writes.
+@st.cache_data(ttl=30, show_spinner=False)
+def _orgs():
+    return list_org_directory()
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _org_label_index():
+    """(labels, id_by_label) for the org directory, built once per cache window."""
+    orgs = _orgs()
+    labels = [f"{name}  <{email}>" for (oid, name, email) in orgs]
+    return labels, {lbl: org[0] for lbl, org in zip(labels, orgs)}
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _trusted(ds_id: int):
+    return list_trusted_org_ids(ds_id)
 
 def build_dataset_label(row):
     _id, name, ver, vis, ts = row
     return f"{name}  (v{ver}) — {vis} — {ts}"
 
+@st.cache_data(ttl=30, show_spinner=False)
+def _label_map(user_id: int):
+    """(rows, labels, id_by_label, row_by_id) for the owner's latest datasets, in one pass."""
+    rows = list_my_latest(user_id)
+    labels_and_ids = [(build_dataset_label(r), r[0]) for r in rows]
+    row_by_id = {r[0]: r for r in rows}
+    return rows, [lbl for lbl, _ in labels_and_ids], dict(labels_and_ids), row_by_id
+
+def dataset_rows_for_user(user_id: int):
+    """(rows, labels, id_by_label, row_by_id); rows are (id, name, version, visibility, created_at)"""
+    try:
+        return _label_map(user_id)
+    except Exception as e:
+        st.error(f"Could not load your datasets: {e}")
+        return [], [], {}, {}
+
 # -------------------------- Dataset selection ------------------------
-rows = dataset_rows_for_user(uid)
+rows, ds_labels, ds_id_by_label, row_by_id = dataset_rows_for_user(uid)
 if not rows:
     st.info("You have no datasets yet. Upload a file first in **Upload Data**.")
     st.stop()
 
-ds_labels = [build_dataset_label(r) for r in rows]
-ds_id_by_label = {label: rows[i][0] for i, label in enumerate(ds_labels)}
-
 selected_label = st.selectbox(
     "Select a dataset",
     options=ds_labels,
@@ -115,157 +140,204 @@ if dataset_id is None:
     # Extra fallback: take first row’s id
     dataset_id = rows[0][0]
 
-current_row = next((r for r in rows if r[0] == dataset_id), None)
-if current_row is None:
-    # Final fallback: use first row
-    current_row = rows[0]
+# Final fallback: use first row
+current_row = row_by_id.get(dataset_id) or rows[0]
 
 ds_name, ds_ver, ds_vis, ds_ts = current_row[1], current_row[2], current_row[3], current_row[4]
 
 # -------------------------- Visibility controls ----------------------
-with st.container(border=True):
-    st.subheader("Dataset visibility")
-    st.write(f"**{ds_name}**  ·  Latest version: **v{ds_ver}**  ·  Uploaded: {ds_ts}")
-
-    vis_options = ["Private", "Trusted", "Public"]
-    vis_index = vis_options.index(ds_vis) if ds_vis in vis_options else 0
-
-    new_vis = st.selectbox(
-        "Visibility",
-        options=vis_options,
-        index=vis_index,
-        key="mp_vis_select",
-    )
-
-    left, right = st.columns([1, 5])
-    with left:
-        if st.button("Update visibility", key="mp_vis_btn"):
-            try:
-                ok = change_visibility(owner_id=uid, dataset_id=dataset_id, new_visibility=new_vis)
-                if ok:
-                    st.success(f"Visibility updated to {new_vis}.")
-                    st.rerun()
-                else:
-                    st.error("Could not update visibility (are you the owner?).")
-            except Exception as e:
-                st.error(f"Update failed: {e}")
+# Fragments rerun on their own, so widget changes here don't re-query the
+# dataset list or org directory; st.rerun() after a write still reruns the page.
+@st.fragment
+def _visibility_fragment(dataset_id: int, ds_name: str, ds_ver: int, ds_ts: str, ds_vis: str):
+    with st.container(border=True):
+        st.subheader("Dataset visibility")
+        st.write(f"**{ds_name}**  ·  Latest version: **v{ds_ver}**  ·  Uploaded: {ds_ts}")
+
+        vis_options = ["Private", "Trusted", "Public"]
+        vis_index = vis_options.index(ds_vis) if ds_vis in vis_options else 0
+
+        new_vis = st.selectbox(
+            "Visibility",
+            options=vis_options,
+            index=vis_index,
+            key="mp_vis_select",
+        )
 
-    with right:
-        if new_vis == "Private":
-            st.info("Only you can access this dataset.")
-        elif new_vis == "Public":
-            st.warning("Anyone with access to your profile/app can view this dataset.")
-        else:
-            st.caption("Trusted: only organisations you select below may access this dataset.")
+        left, right = st.columns([1, 5])
+        with left:
+            if st.button("Update visibility", key="mp_vis_btn"):
+                try:
+                    ok = change_visibility(owner_id=uid, dataset_id=dataset_id, new_visibility=new_vis)
+                    if ok:
+                        _label_map.clear()
+                        st.success(f"Visibility updated to {new_vis}.")
+                        st.rerun()
+                    else:
+                        st.error("Could not update visibility (dataset not found or not yours).")
+                except VisibilityConflictError:
+                    st.warning("Someone else changed this dataset's visibility at the same time. Reload and try again.")
+                except Exception as e:
+                    st.error(f"Update failed: {e}")
 
-# -------------------------- Trusted organisations --------------------
-with st.container(border=True):
-    st.subheader("Trusted organisations")
+        with right:
+            if new_vis == "Private":
+                st.info("Only you can access this dataset.")
+            elif new_vis == "Public":
+                st.warning("Anyone with access to your profile/app can view this dataset.")
+            else:
+                st.caption("Trusted: only organisations you select below may access this dataset.")
 
-    try:
-        orgs = list_org_directory()  # [(id, name, email), ...]
-    except Exception as e:
-        orgs = []
-        st.error(f"Could not load organisation directory: {e}")
 
-    if not orgs:
-        st.info("No verified organisations are available yet.")
-    else:
-        org_labels = [f"{name}  <{email}>" for (oid, name, email) in orgs]
-        org_id_by_label = {org_labels[i]: orgs[i][0] for i in range(len(orgs))}
+# -------------------------- Trusted organisations --------------------
+@st.fragment
+def _trusted_fragment(dataset_id: int, uid: int):
+    with st.container(border=True):
+        st.subheader("Trusted organisations")
 
         try:
-            current_trusted_ids = set(list_trusted_org_ids(dataset_id))
+            orgs = _orgs()  # [(id, name, email), ...]
         except Exception as e:
-            current_trusted_ids = set()
-            st.error(f"Could not load current trusted orgs: {e}")
-
-        default_org_labels = [lbl for lbl, oid in org_id_by_label.items() if oid in current_trusted_ids]
+            orgs = []
+            st.error(f"Could not load organisation directory: {e}")
 
-        sel_org_labels = st.multiselect(
-            "Select which organisations may access this dataset when visibility = Trusted",
-            options=org_labels,
-            default=default_org_labels,
-            key="mp_trusted_ms",
-        )
-        chosen_org_ids = [org_id_by_label[lbl] for lbl in sel_org_labels]
-
-        with st.expander("Optional: default policy for new grants", expanded=False):
-            scope = st.text_input(
-                "Default scope (comma-separated tags, e.g. agg-only,no-ads,no-LLMs)",
-                key="mp_def_scope",
-                placeholder="(optional)"
-            )
-            exp = st.date_input(
-                "Default expiry date (optional)",
-                value=None,
-                format="YYYY-MM-DD",
-                key="mp_def_expiry"
-            )
-            default_expires_iso = exp.isoformat() if isinstance(exp, date) else None
-
-        col_a, col_b, _col_spacer = st.columns([1, 1, 6])
-        with col_a:
-            if st.button("Save trusted orgs", type="primary", key="mp_trusted_save"):
-                try:
-                    summary = set_trusted_orgs(
-                        dataset_id=dataset_id,
-                        owner_id=uid,
-                        new_org_ids=chosen_org_ids,
-                        default_scope=(scope.strip() or None),
-                        default_expires_at=default_expires_iso,
-                    )
-                    added = summary.get("added") or []
-                    removed = summary.get("removed") or []
-                    st.success(f"Trusted orgs updated. Added: {added or 'none'} · Removed: {removed or 'none'}.")
-                    st.rerun()
-                except Exception as e:
-                    st.error(f"Update failed: {e}")
-
-        with col_b:
-            if st.button("Reload", key="mp_trusted_reload"):
-                st.rerun()
+        if not orgs:
+            st.info("No verified organisations are available yet.")
+        else:
+            org_labels, org_id_by_label = _org_label_index()
 
-        with st.expander("Edit scope/expiry for a specific organisation", expanded=False):
-            base_ids = chosen_org_ids or list(current_trusted_ids)
-            if not base_ids:
-                st.caption("No trusted organisations yet.")
+            try:
+                current_trusted_ids = set(_trusted(dataset_id))
+            except Exception as e:
+                current_trusted_ids = set()
+                st.error(f"Could not load current trusted orgs: {e}")
+
+            default_org_labels = [lbl for lbl, oid in org_id_by_label.items() if oid in current_trusted_ids]
+
+            if len(org_labels) <= ORG_FILTER_THRESHOLD:
+                sel_org_labels = st.multiselect(
+                    "Select which organisations may access this dataset when visibility = Trusted",
+                    options=org_labels,
+                    default=default_org_labels,
+                    key="mp_trusted_ms",
+                )
             else:
-                name_by_id = {oid: name for (oid, name, email) in orgs}
-                id_options = [(oid, name_by_id.get(oid, f"Org {oid}")) for oid in base_ids]
-
-                opt_labels = [f"{oid} — {nm}" for oid, nm in id_options]
-                chosen_label = st.selectbox("Choose org", options=opt_labels, key="mp_edit_org_sel")
-
-                sel_org_id = None
-                if chosen_label:
+                # Large directory: only render a filtered slice of options, but always
+                # keep the current picks in the list so they don't disappear.
+                # Picks are stored as org ids with the trusted-id snapshot they
+                # started from; plain session_state outlives page navigation, so
+                # re-seed from the DB when grants changed elsewhere (e.g. approved
+                # on Review Requests). Ids, not labels: a renamed org or one that
+                # left the directory is mapped (or dropped) against the fresh index.
+                sel_key = f"mp_trusted_sel_{dataset_id}"
+                snapshot = frozenset(current_trusted_ids)
+                label_by_id = {oid: lbl for lbl, oid in org_id_by_label.items()}
+                seen_snapshot, picked_ids = st.session_state.get(sel_key, (None, None))
+                if seen_snapshot != snapshot:
+                    picked = default_org_labels
+                else:
+                    picked = [label_by_id[oid] for oid in picked_ids if oid in label_by_id]
+                picked_set = set(picked)
+                org_q = st.text_input("Filter organisations", key="mp_trusted_filter",
+                                      placeholder="name or email").strip().lower()
+                matches = [lbl for lbl in org_labels
+                           if lbl not in picked_set and (not org_q or org_q in lbl.lower())]
+                sel_org_labels = st.multiselect(
+                    "Select which organisations may access this dataset when visibility = Trusted",
+                    options=picked + matches[:ORG_FILTER_MAX_SHOWN],
+                    default=picked,
+                )
+                st.session_state[sel_key] = (snapshot, [org_id_by_label[lbl] for lbl in sel_org_labels])
+                if len(matches) > ORG_FILTER_MAX_SHOWN:
+                    st.caption(f"Showing {ORG_FILTER_MAX_SHOWN} of {len(matches)} organisations — refine the filter.")
+            chosen_org_ids = [org_id_by_label[lbl] for lbl in sel_org_labels]
+
+            with st.expander("Optional: default policy for new grants", expanded=False):
+                scope = st.text_input(
+                    "Default scope (comma-separated tags, e.g. agg-only,no-ads,no-LLMs)",
+                    key="mp_def_scope",
+                    placeholder="(optional)"
+                )
+                exp = st.date_input(
+                    "Default expiry date (optional)",
+                    value=None,
+                    format="YYYY-MM-DD",
+                    key="mp_def_expiry"
+                )
+                default_expires_iso = exp.isoformat() if isinstance(exp, date) else None
+
+            col_a, col_b, _col_spacer = st.columns([1, 1, 6])
+            with col_a:
+                if st.button("Save trusted orgs", type="primary", key="mp_trusted_save"):
                     try:
-                        sel_org_id = int(chosen_label.split(" — ")[0])
-                    except Exception:
-                        sel_org_id = None
-
-                col1, col2, col3 = st.columns([2, 2, 2])
-                with col1:
-                    scope_u = st.text_input("Scope", key="mp_edit_scope", placeholder="e.g. agg-only,no-ads")
-                with col2:
-                    exp_u = st.date_input("Expiry", value=None, format="YYYY-MM-DD", key="mp_edit_expiry")
-                with col3:
-                    st.markdown("&nbsp;")
-                    if st.button("Save details", key="mp_edit_save"):
-                        if sel_org_id is None:
-                            st.error("Please select a valid organisation.")
-                        else:
-                            try:
-                                update_permission_details(
-                                    dataset_id=dataset_id,
-                                    owner_id=uid,
-                                    org_id=sel_org_id,
-                                    scope=(scope_u.strip() or None),
-                                    expires_at=(exp_u.isoformat() if isinstance(exp_u, date) else None),
-                                )
-                                st.success("Permission details updated.")
-                            except Exception as e:
-                                st.error(f"Update failed: {e}")
+                        summary = set_trusted_orgs(
+                            dataset_id=dataset_id,
+                            owner_id=uid,
+                            new_org_ids=chosen_org_ids,
+                            default_scope=(scope.strip() or None),
+                            default_expires_at=default_expires_iso,
+                        )
+                        _trusted.clear()
+                        added = summary.get("added") or []
+                        removed = summary.get("removed") or []
+                        st.success(f"Trusted orgs updated. Added: {added or 'none'} · Removed: {removed or 'none'}.")
+                        st.rerun()
+                    except Exception as e:
+                        st.error(f"Update failed: {e}")
+
+            with col_b:
+                if st.button("Reload", key="mp_trusted_reload"):
+                    _orgs.clear()
+                    _org_label_index.clear()
+                    _trusted.clear()
+                    st.session_state.pop(f"mp_trusted_sel_{dataset_id}", None)
+                    st.rerun()
+
+            with st.expander("Edit scope/expiry for a specific organisation", expanded=False):
+                base_ids = chosen_org_ids or list(current_trusted_ids)
+                if not base_ids:
+                    st.caption("No trusted organisations yet.")
+                else:
+                    name_by_id = {oid: name for (oid, name, email) in orgs}
+                    id_options = [(oid, name_by_id.get(oid, f"Org {oid}")) for oid in base_ids]
+
+                    opt_labels = [f"{oid} — {nm}" for oid, nm in id_options]
+                    chosen_label = st.selectbox("Choose org", options=opt_labels, key="mp_edit_org_sel")
+
+                    sel_org_id = None
+                    if chosen_label:
+                        try:
+                            sel_org_id = int(chosen_label.split(" — ")[0])
+                        except Exception:
+                            sel_org_id = None
+
+                    col1, col2, col3 = st.columns([2, 2, 2])
+                    with col1:
+                        scope_u = st.text_input("Scope", key="mp_edit_scope", placeholder="e.g. agg-only,no-ads")
+                    with col2:
+                        exp_u = st.date_input("Expiry", value=None, format="YYYY-MM-DD", key="mp_edit_expiry")
+                    with col3:
+                        st.markdown("&nbsp;")
+                        if st.button("Save details", key="mp_edit_save"):
+                            if sel_org_id is None:
+                                st.error("Please select a valid organisation.")
+                            else:
+                                try:
+                                    update_permission_details(
+                                        dataset_id=dataset_id,
+                                        owner_id=uid,
+                                        org_id=sel_org_id,
+                                        scope=(scope_u.strip() or None),
+                                        expires_at=(exp_u.isoformat() if isinstance(exp_u, date) else None),
+                                    )
+                                    _trusted.clear()
+                                    st.success("Permission details updated.")
+                                except Exception as e:
+                                    st.error(f"Update failed: {e}")
+
+
+_visibility_fragment(dataset_id, ds_name, ds_ver, ds_ts, ds_vis)
+_trusted_fragment(dataset_id, uid)
 
 # -------------------------- Footer -----------------------------------
 st.caption("All permission changes (visibility & trusted orgs) are logged to the consent log.")
@@ -15,25 +15,34 @@ if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 # -------------------------------------------------------
 
+import io
+import csv
 import json
 from datetime import datetime, timedelta, date, timezone
 import pandas as pd
+from dateutil.tz import tzlocal
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+
+try:
+    import orjson  # optional C JSON codec; stdlib json is the fallback
+except ImportError:
+    orjson = None
 import streamlit as st
 
-from db import get_conn
+from db import get_readonly_conn
 
 # ---------------- Page config & sidebar theme ----------------
+_SIDEBAR_CSS = """
+<style>
+    [data-testid="stSidebar"] { background-color: #0D2847; color: white; }
+    [data-testid="stSidebar"] * { color: white !important; }
+    .btn-row > div > button { width: 100% !important; }
+</style>
+"""
+
 st.set_page_config(page_title="Consent log", page_icon="📜", layout="wide")
-st.markdown(
-    """
-    <style>
-        [data-testid="stSidebar"] { background-color: #0D2847; color: white; }
-        [data-testid="stSidebar"] * { color: white !important; }
-        .btn-row > div > button { width: 100% !important; }
-    </style>
-    """,
-    unsafe_allow_html=True
-)
+st.markdown(_SIDEBAR_CSS, unsafe_allow_html=True)
 
 st.title("Consent Log")
 
@@ -58,77 +67,130 @@ def _now_utc() -> datetime:
 def _default_start() -> date:
     return (_now_utc() - timedelta(days=30)).date()
 
-@st.cache_data(ttl=60)
-def _distinct_vals(col: str) -> list[str]:
-    with get_conn() as conn:
-        rows = conn.execute(f"SELECT DISTINCT {col} FROM access_logs ORDER BY {col} ASC").fetchall()
-    return [r[0] for r in rows if r and r[0]]
+@st.cache_data(ttl=600, show_spinner=False)
+def _distinct_roles_actions() -> tuple[list[str], list[str]]:
+    """(roles, actions) seen in access_logs, from one scan of the log index."""
+    conn = get_readonly_conn()
+    rows = conn.execute("SELECT DISTINCT actor_role, action FROM access_logs").fetchall()
+    roles = sorted({r for r, _ in rows if r})
+    actions = sorted({a for _, a in rows if a})
+    return roles, actions
+
+@st.cache_data(ttl=600, show_spinner=False)
+def _has_log_fts() -> bool:
+    """True once db_init has created the logs_fts search index."""
+    row = get_readonly_conn().execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='logs_fts'"
+    ).fetchone()
+    return row is not None
 
 def _safe_json_compact(s: str | None) -> str:
     if not s:
         return ""
     try:
+        if orjson is not None:
+            # orjson output is already compact and non-ASCII-preserving
+            return orjson.dumps(orjson.loads(s)).decode()
         obj = json.loads(s)
         return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
     except Exception:
         return s
 
+def _compact_meta(raw: pd.Series) -> pd.Series:
+    # audit.log_event already stores compact JSON, so most rows can be shown
+    # as-is. Only re-serialize rows with whitespace or escapes (\uXXXX), which
+    # the roundtrip would actually change.
+    raw = raw.fillna("")
+    needs = raw.str.contains(r"[\s\\]", regex=True, na=False)
+    out = raw.copy()
+    if needs.any():
+        # plain loop over the object array: no pandas per-element dispatch
+        out.loc[needs] = [_safe_json_compact(x) for x in raw.loc[needs].to_numpy()]
+    return out
+
 def _safe_json_pretty(s: str | None) -> str:
     if not s:
         return ""
     try:
+        if orjson is not None:
+            return orjson.dumps(orjson.loads(s), option=orjson.OPT_INDENT_2).decode()
         obj = json.loads(s)
         return json.dumps(obj, ensure_ascii=False, indent=2)
     except Exception:
         return s
 
+def _csv_buffer(df: pd.DataFrame, chunksize: int = 1000) -> io.BytesIO:
+    # pyarrow formats CSV in C. Convert and write one chunk of rows at a time
+    # so only a chunk's Arrow copy is alive at once; fall back to pandas for
+    # columns arrow can't convert (mixed objects). Arrow quotes the header and
+    # prints datetimes as "...00.000000000+0100", so the header is written the
+    # way pandas writes it and datetime columns are pre-formatted as to_csv
+    # would (astype(str) uses the same formatter).
+    buf = io.BytesIO()
+    try:
+        dt_cols = [c for c in df.columns if pd.api.types.is_datetime64_any_dtype(df[c])]
+        if dt_cols:
+            df = df.assign(**{c: df[c].astype(str).where(df[c].notna(), None) for c in dt_cols})
+        schema = pa.Schema.from_pandas(df, preserve_index=False)
+        header = io.StringIO()
+        csv.writer(header, lineterminator="\n").writerow(df.columns)
+        buf.write(header.getvalue().encode("utf-8"))
+        opts = pa_csv.WriteOptions(include_header=False)
+        with pa_csv.CSVWriter(buf, schema, write_options=opts) as writer:
+            for start in range(0, len(df), chunksize):
+                chunk = df.iloc[start:start + chunksize]
+                writer.write_batch(pa.RecordBatch.from_pandas(chunk, schema=schema, preserve_index=False))
+    except (pa.ArrowException, TypeError, ValueError):
+        buf = io.BytesIO()
+        df.to_csv(buf, index=False, encoding="utf-8", chunksize=chunksize)
+    buf.seek(0)
+    return buf
+
 def _to_local(dt_series: pd.Series, tz_name: str) -> pd.Series:
+    # _query_logs parsed the column to naive datetimes in the server's local
+    # time (NOW() / datetime('now','localtime')); label them as such, then convert
     try:
-        s = pd.to_datetime(dt_series, errors="coerce", utc=True)
-        return s.dt.tz_convert(tz_name)
+        aware = dt_series.dt.tz_localize(tzlocal(), ambiguous="NaT", nonexistent="shift_forward")
+        return aware.dt.tz_convert(tz_name)
     except Exception:
         return dt_series
 
-@st.cache_data(ttl=30, show_spinner=False)
-def _query_logs(
-    start_d: date,
-    end_d: date,
-    roles: list[str],
-    actions: list[str],
-    q_text: str | None,
-    actor_name_q: str | None,
-    actor_email_q: str | None,
-    only_owner_id: int | None,
-    limit: int,
-    offset: int,
-):
+def _log_sql(shape: tuple) -> tuple[str, str]:
+    """
+    (page_sql, stats_sql) for one filter *shape*; values are bound at execute
+    time, so a repeated shape builds identical text and reuses SQLite's
+    prepared plan. Building the string is ~1 µs, far cheaper than a
+    st.cache_data lookup, so it isn't cached.
+
+    Role/action filters bind one JSON array each, so only their presence
+    (not the selection size) changes the shape; they are left out entirely
+    when every option is selected. The actor name/email quick filters are
+    always present as ``(? IS NULL OR ...)`` guards bound to NULL when unset.
+    """
+    has_start, has_end, has_roles, has_actions, has_owner, q_mode, has_after = shape
     where = ["1=1"]
-    params: list = []
-
-    # Dates
-    if isinstance(start_d, date):
-        where.append("DATE(l.at) >= DATE(?)")
-        params.append(start_d.isoformat())
-    if isinstance(end_d, date):
-        where.append("DATE(l.at) <= DATE(?)")
-        params.append(end_d.isoformat())
-
-    # Roles & actions
-    if roles:
-        where.append(f"l.actor_role IN ({','.join('?' for _ in roles)})")
-        params.extend(roles)
-    if actions:
-        where.append(f"l.action IN ({','.join('?' for _ in actions)})")
-        params.extend(actions)
 
-    # Owner filter
-    if only_owner_id is not None:
-        where.append("COALESCE(d.owner_id,-1) = ?")
-        params.append(int(only_owner_id))
-
-    # General search
-    if q_text:
-        like = f"%{q_text}%"
+    # Dates: half-open range on the raw column so idx_logs_at_id applies
+    if has_start:
+        where.append("l.at >= ?")
+    if has_end:
+        where.append("l.at < ?")
+
+    # Roles & actions: one JSON-array parameter each, whatever the selection size
+    if has_roles:
+        where.append("l.actor_role IN (SELECT value FROM json_each(?))")
+    if has_actions:
+        where.append("l.action IN (SELECT value FROM json_each(?))")
+
+    # Owner filter (plain equality keeps idx_datasets_owner usable; orphaned
+    # log rows have NULL d.owner_id and never match)
+    if has_owner:
+        where.append("d.owner_id = ?")
+
+    # General search: trigram FTS when possible, LIKE for short terms
+    if q_mode == "fts":
+        where.append("l.id IN (SELECT rowid FROM logs_fts WHERE logs_fts MATCH ?)")
+    elif q_mode == "like":
         where.append(
             "("
             "  COALESCE(d.name,'') LIKE ? OR "
@@ -137,15 +199,10 @@ def _query_logs(
             "  COALESCE(l.meta,'') LIKE ?"
             ")"
         )
-        params.extend([like, like, like, like])
 
     # Specific actor quick filters
-    if actor_name_q:
-        where.append("COALESCE(a.name,'') LIKE ?")
-        params.append(f"%{actor_name_q}%")
-    if actor_email_q:
-        where.append("COALESCE(a.email,'') LIKE ?")
-        params.append(f"%{actor_email_q}%")
+    where.append("(? IS NULL OR COALESCE(a.name,'') LIKE ?)")
+    where.append("(? IS NULL OR COALESCE(a.email,'') LIKE ?)")
 
     sql_base = f"""
     FROM access_logs l
@@ -154,8 +211,13 @@ def _query_logs(
     WHERE {' AND '.join(where)}
     """
 
+    # Keyset paging: resume strictly after the previous page's last (at, id)
+    seek = "AND (l.at, l.id) < (?, ?)" if has_after else ""
+    paging = "LIMIT ?" if has_after else "LIMIT ? OFFSET ?"
+
     sql = f"""
     SELECT
+        l.id                    AS log_id,
         l.at                    AS timestamp,
         l.action                AS action,
         l.actor_role            AS actor_role,
@@ -167,21 +229,140 @@ def _query_logs(
         d.owner_id              AS dataset_owner_id,
         l.meta                  AS meta_raw
     {sql_base}
+    {seek}
     ORDER BY l.at DESC, l.id DESC
-    LIMIT ? OFFSET ?
+    {paging}
+    """
+    # Totals over every filtered row (not just this page) from one scan: the
+    # CTE is referenced three times, so SQLite materializes it once.
+    stats_sql = f"""
+    WITH f AS (SELECT l.dataset_id, l.action {sql_base})
+    SELECT
+        (SELECT COUNT(1) FROM f),
+        (SELECT COUNT(DISTINCT dataset_id) FROM f),
+        (SELECT action FROM f GROUP BY action ORDER BY COUNT(1) DESC, action LIMIT 1)
     """
-    params_with_paging = params + [int(limit), int(offset)]
+    return sql, stats_sql
 
-    with get_conn() as conn:
-        rows = conn.execute(sql, params_with_paging).fetchall()
-        total = conn.execute(f"SELECT COUNT(1) {sql_base}", params).fetchone()[0]
+def _log_filters(
+    start_d: date,
+    end_d: date,
+    roles: list[str],
+    actions: list[str],
+    q_text: str | None,
+    actor_name_q: str | None,
+    actor_email_q: str | None,
+    only_owner_id: int | None,
+) -> tuple[tuple, list]:
+    """(shape, params) for _log_sql; params follow the predicate order there."""
+    has_start = isinstance(start_d, date)
+    has_end = isinstance(end_d, date)
+
+    params: list = []
+    if has_start:
+        params.append(f"{start_d.isoformat()} 00:00:00")
+    if has_end:
+        params.append(f"{(end_d + timedelta(days=1)).isoformat()} 00:00:00")
+    # An empty list means "every option selected": no predicate at all
+    if roles:
+        params.append(json.dumps(list(roles)))
+    if actions:
+        params.append(json.dumps(list(actions)))
+    if only_owner_id is not None:
+        params.append(int(only_owner_id))
+    q_mode = None
+    if q_text:
+        # trigram FTS only indexes 3+ character substrings, and MATCH takes
+        # % and _ literally; keep LIKE (wildcard) semantics for those terms
+        if len(q_text) >= 3 and not any(c in q_text for c in "%_") and _has_log_fts():
+            q_mode = "fts"
+            params.append('"' + q_text.replace('"', '""') + '"')
+        else:
+            q_mode = "like"
+            params.extend([f"%{q_text}%"] * 4)
+    name_like = f"%{actor_name_q}%" if actor_name_q else None
+    email_like = f"%{actor_email_q}%" if actor_email_q else None
+    params.extend([name_like, name_like, email_like, email_like])
+
+    shape = (
+        has_start, has_end, bool(roles), bool(actions),
+        only_owner_id is not None, q_mode, False,
+    )
+    return shape, params
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _log_stats(
+    start_d: date,
+    end_d: date,
+    roles: list[str],
+    actions: list[str],
+    q_text: str | None,
+    actor_name_q: str | None,
+    actor_email_q: str | None,
+    only_owner_id: int | None,
+) -> tuple[int, int, str | None]:
+    """
+    (total rows, unique datasets, top action) over all matching rows; keyed
+    on filters only, so paging reuses it.
+    """
+    shape, params = _log_filters(
+        start_d, end_d, roles, actions, q_text, actor_name_q, actor_email_q, only_owner_id
+    )
+    _, stats_sql = _log_sql(shape)
+    total, n_datasets, top_action = get_readonly_conn().execute(stats_sql, params).fetchone()
+    return int(total), int(n_datasets), top_action
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _query_logs(
+    start_d: date,
+    end_d: date,
+    roles: list[str],
+    actions: list[str],
+    q_text: str | None,
+    actor_name_q: str | None,
+    actor_email_q: str | None,
+    only_owner_id: int | None,
+    limit: int,
+    offset: int,
+    after_at: str | None = None,
+    after_id: int | None = None,
+) -> pd.DataFrame:
+    """
+    One page of log rows. With a cursor (after_at, after_id) the page seeks
+    past that row instead of skipping `offset` rows; df.attrs["next_cursor"]
+    holds the cursor for the following page.
+    """
+    shape, params = _log_filters(
+        start_d, end_d, roles, actions, q_text, actor_name_q, actor_email_q, only_owner_id
+    )
+    if after_at is not None and after_id is not None:
+        sql, _ = _log_sql(shape[:-1] + (True,))
+        params_with_paging = params + [after_at, int(after_id), int(limit)]
+    else:
+        sql, _ = _log_sql(shape)
+        params_with_paging = params + [int(limit), int(offset)]
+
+    rows = get_readonly_conn().execute(sql, params_with_paging).fetchall()
 
     cols = [
-        "timestamp","action","actor_role","actor_id","actor_name","actor_email",
+        "log_id","timestamp","action","actor_role","actor_id","actor_name","actor_email",
         "dataset_id","dataset_name","dataset_owner_id","meta_raw"
     ]
     df = pd.DataFrame(rows, columns=cols)
-    return df, int(total)
+    df.attrs["next_cursor"] = (rows[-1][1], rows[-1][0]) if rows else None
+    # Parse once here (ISO8601 fast path); values stay naive server-local time,
+    # as stored, and only the timezone display branch localizes them.
+    # cache=True parses each distinct string once: batched events share a stamp.
+    df["timestamp"] = pd.to_datetime(
+        df["timestamp"], format="ISO8601", errors="coerce", cache=True
+    )
+    return df
+
+@st.cache_data(ttl=30, show_spinner=False)
+def _action_counts(*log_args) -> pd.Series:
+    """Per-action counts for one page, keyed on the same args as _query_logs."""
+    df = _query_logs(*log_args)
+    return df["action"].value_counts().rename("count")
 
 # ---------------- Filter controls ----------------
 with st.container(border=True):
@@ -216,8 +397,7 @@ with st.container(border=True):
                 st.session_state["cl_to"] = date.today()
                 st.session_state["cl_page"] = 1
 
-        roles_all   = _distinct_vals("actor_role")
-        actions_all = _distinct_vals("action")
+        roles_all, actions_all = _distinct_roles_actions()
 
         c4, c5 = st.columns(2)
         with c4:
@@ -253,7 +433,7 @@ with st.container(border=True):
             refresh = st.button("Refresh", type="primary")
 
         if reset:
-            for k in ("cl_from", "cl_to", "cl_page"):
+            for k in ("cl_from", "cl_to", "cl_page", "cl_cursors", "cl_cursor_key"):
                 if k in st.session_state:
                     del st.session_state[k]
             st.rerun()
@@ -279,12 +459,36 @@ offset = (st.session_state["cl_page"] - 1) * int(limit)
 
 # ---------------- Query + format ----------------
 owner_filter = uid if only_mine else None
-df, total_rows = _query_logs(
+# "Everything selected" is the default; drop the IN (...) predicate entirely then
+roles_filter = [] if set(roles_sel) == set(roles_all) else roles_sel
+actions_filter = [] if set(actions_sel) == set(actions_all) else actions_sel
+filter_args = (
     start_d, end_d,
-    roles_sel, actions_sel,
+    roles_filter, actions_filter,
     q_text, actor_name_q, actor_email_q,
-    owner_filter, int(limit), int(offset)
+    owner_filter,
+)
+
+# Keyset cursors: page number -> (at, id) of the row just before that page.
+# Pages reached via Prev/Next seek from a cursor; a typed-in page number with
+# no cursor yet falls back to OFFSET. Any filter change invalidates them.
+cursor_key = (
+    start_d, end_d, tuple(roles_filter), tuple(actions_filter),
+    q_text, actor_name_q, actor_email_q, owner_filter, int(limit),
 )
+if st.session_state.get("cl_cursor_key") != cursor_key:
+    st.session_state["cl_cursor_key"] = cursor_key
+    st.session_state["cl_cursors"] = {}
+cursors = st.session_state["cl_cursors"]
+after_at, after_id = cursors.get(int(st.session_state["cl_page"])) or (None, None)
+
+log_args = filter_args + (int(limit), int(offset), after_at, after_id)
+df = _query_logs(*log_args)
+# filters only, shared across pages
+total_rows, unique_datasets, top_action = _log_stats(*filter_args)
+action_counts = _action_counts(*log_args)
+if df.attrs.get("next_cursor"):
+    cursors[int(st.session_state["cl_page"]) + 1] = df.attrs["next_cursor"]
 
 if df.empty:
     st.info("No log entries match your filters.")
@@ -295,24 +499,23 @@ if tz_local:
     df["timestamp"] = _to_local(df["timestamp"], LOCAL_TZ)
 
 # Meta formatting
-df["meta"] = (df["meta_raw"].map(_safe_json_pretty) if pretty_meta
-              else df["meta_raw"].map(_safe_json_compact))
-df.drop(columns=["meta_raw"], inplace=True)
+df["meta"] = ([_safe_json_pretty(x) for x in df["meta_raw"].to_numpy()] if pretty_meta
+              else _compact_meta(df["meta_raw"]))
+df.drop(columns=["log_id", "meta_raw"], inplace=True)
 
 # ---------------- Metrics ----------------
 with st.container(border=True):
     c1, c2, c3, c4 = st.columns(4)
     c1.metric("Rows (this page)", len(df))
     c2.metric("Total rows (all pages)", total_rows)
-    c3.metric("Unique datasets", df["dataset_id"].nunique())
-    top_action = df["action"].value_counts().idxmax() if not df.empty else "-"
-    c4.metric("Top action", top_action)
+    c3.metric("Unique datasets (all pages)", unique_datasets)
+    c4.metric("Top action (all pages)", top_action or "-")
 
 # ---------------- Table ----------------
 st.dataframe(df, use_container_width=True, hide_index=True)
 
 # ---------------- CSV export ----------------
-csv = df.to_csv(index=False).encode("utf-8")
+csv = _csv_buffer(df)
 ts_suffix = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
 st.download_button(
     "⬇️ Download this page as CSV",
@@ -337,5 +540,4 @@ with next_col:
 
 # ---------------- Action counts (this page) ----------------
 with st.expander("See action counts (this page)"):
-    cnt = df.groupby("action").size().reset_index(name="count").sort_values("count", ascending=False)
-    st.bar_chart(cnt.set_index("action"))
+    st.bar_chart(action_counts)
@@ -18,58 +18,46 @@ import streamlit as st
 from datetime import date
 from permissions import list_pending_requests_for_owner, approve_request, deny_request
 
+_SIDEBAR_CSS = """
+<style>
+    [data-testid="stSidebar"] {
+        background-color: #0D2847; /* dark blue */
+        color: white;
+    }
+    [data-testid="stSidebar"] * {
+        color: white !important;
+    }
+</style>
+"""
+
+st.set_page_config(page_title="Review Requests", page_icon="🗂️", layout="wide")
+
+# Custom Sidebar Styles (once per run, for both the gate and the page)
+st.markdown(_SIDEBAR_CSS, unsafe_allow_html=True)
+
 # ---- Gate: require login ----
 uid = st.session_state.get("uid")
 if not uid:
-    st.set_page_config(page_title="Review Requests", page_icon="🗂️", layout="wide")
-
-    # Custom Sidebar Styles
-    st.markdown(
-        """
-        <style>
-            [data-testid="stSidebar"] {
-                background-color: #0D2847; /* dark blue */
-                color: white;
-            }
-            [data-testid="stSidebar"] * {
-                color: white !important;
-            }
-        </style>
-        """,
-        unsafe_allow_html=True
-    )
-
     st.warning("Please log in first (see **Login / Sign Up**).")
     st.stop()
 
-st.set_page_config(page_title="Review Requests", page_icon="🗂️", layout="wide")
-
-# Custom Sidebar Styles
-st.markdown(
-    """
-    <style>
-        [data-testid="stSidebar"] {
-            background-color: #0D2847; /* dark blue */
-            color: white;
-        }
-        [data-testid="stSidebar"] * {
-            color: white !important;
-        }
-    </style>
-    """,
-    unsafe_allow_html=True
-)
-
 st.title("Review Access Requests")
 
+@st.cache_data(ttl=30, show_spinner=False)
+def _pending(owner_id: int):
+    """Pending requests for owner_id; keeps widget reruns off the 3-table join."""
+    return list_pending_requests_for_owner(owner_id)
+
 # ---- Fetch pending requests ----
-rows = list_pending_requests_for_owner(uid)  # (dataset_id, dataset_name, org_id, org_name, requested_at)
+rows = _pending(uid)  # (dataset_id, dataset_name, org_id, org_name, requested_at)
 if not rows:
     st.info("No pending requests at this time.")
     st.stop()
 
 for (ds_id, ds_name, org_id, org_name, req_at) in rows:
-    with st.container(border=True):
+    # One form per request: typing in its fields doesn't rerun the page until
+    # Approve or Deny is submitted.
+    with st.form(f"req_{ds_id}_{org_id}", border=True):
         st.markdown(f"**{ds_name}** · requested by **{org_name}** (org #{org_id}) · {req_at}")
 
         # Approve / Deny controls
@@ -87,38 +75,44 @@ for (ds_id, ds_name, org_id, org_name, req_at) in rows:
                 format="YYYY-MM-DD",
                 key=f"exp_{ds_id}_{org_id}"
             )
-            exp_iso = exp.isoformat() if isinstance(exp, date) else None
 
         colA, colB, _ = st.columns([1, 1, 4])
         with colA:
-            if st.button("✅ Approve", type="primary", key=f"approve_{ds_id}_{org_id}"):
-                try:
-                    approve_request(
-                        dataset_id=ds_id,
-                        owner_id=uid,
-                        org_id=org_id,
-                        scope=(scope.strip() or None),
-                        expires_at=exp_iso,
-                    )
-                    st.success(f"Approved access for {org_name}.")
-                    st.rerun()
-                except Exception as e:
-                    st.error(f"Failed to approve: {e}")
+            approve = st.form_submit_button("✅ Approve", type="primary")
         with colB:
             deny_reason = st.text_input(
                 "Reason (optional)",
                 key=f"deny_reason_{ds_id}_{org_id}",
                 placeholder="Why denying?"
             )
-            if st.button("❌ Deny", key=f"deny_{ds_id}_{org_id}"):
-                try:
-                    deny_request(
-                        dataset_id=ds_id,
-                        owner_id=uid,
-                        org_id=org_id,
-                        reason=(deny_reason.strip() or None),
-                    )
-                    st.warning(f"Denied access for {org_name}.")
-                    st.rerun()
-                except Exception as e:
-                    st.error(f"Failed to deny: {e}")
+            deny = st.form_submit_button("❌ Deny")
+
+    if approve:
+        exp_iso = exp.isoformat() if isinstance(exp, date) else None
+        try:
+            approve_request(
+                dataset_id=ds_id,
+                owner_id=uid,
+                org_id=org_id,
+                scope=(scope.strip() or None),
+                expires_at=exp_iso,
+            )
+            # approvals also change trusted-org lists cached on other pages
+            st.cache_data.clear()
+            st.success(f"Approved access for {org_name}.")
+            st.rerun()
+        except Exception as e:
+            st.error(f"Failed to approve: {e}")
+    elif deny:
+        try:
+            deny_request(
+                dataset_id=ds_id,
+                owner_id=uid,
+                org_id=org_id,
+                reason=(deny_reason.strip() or None),
+            )
+            st.cache_data.clear()
+            st.warning(f"Denied access for {org_name}.")
+            st.rerun()
+        except Exception as e:
+            st.error(f"Failed to deny: {e}")
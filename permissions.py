@@ -24,7 +24,8 @@ import sqlite3
 from typing import List, Tuple, Optional, Dict, Any
 
 from db import get_conn
-from audit import log_event
+from audit import log_event, log_events
+from access import invalidate_access_cache
 
 NOW = lambda: time.strftime("%Y-%m-%d %H:%M:%S")
 
@@ -37,6 +38,18 @@ def _sanitize_scope(scope: Optional[str]) -> Optional[str]:
     s = (scope or "").strip()
     return s or None
 
+# One statement per upsert: a single write-lock acquisition instead of
+# INSERT OR IGNORE followed by UPDATE. updated_at is stamped on insert too,
+# as the old UPDATE always did. Relies on uniq_dataset_org(dataset_id, org_id).
+_UPSERT_PERMISSION_SQL = """
+    INSERT INTO permissions(dataset_id, org_id, allow, scope, expires_at, status, created_at, updated_at)
+    VALUES(?,?,?,?,?,?,?,?)
+    ON CONFLICT(dataset_id, org_id) DO UPDATE SET
+      allow=excluded.allow, status=excluded.status,
+      scope=excluded.scope, expires_at=excluded.expires_at,
+      updated_at=excluded.updated_at
+"""
+
 def _upsert_permission(
     conn: sqlite3.Connection,
     dataset_id: int,
@@ -48,20 +61,23 @@ def _upsert_permission(
     expires_at: Optional[str] = None,
 ) -> None:
     """Create-or-update a permissions row atomically."""
+    ts = NOW()
     conn.execute(
-        """
-        INSERT OR IGNORE INTO permissions(dataset_id, org_id, allow, scope, expires_at, status, created_at)
-        VALUES(?,?,?,?,?,?,?)
-        """,
-        (dataset_id, org_id, int(allow), scope, expires_at, status, NOW()),
+        _UPSERT_PERMISSION_SQL,
+        (dataset_id, org_id, int(allow), scope, expires_at, status, ts, ts),
     )
-    conn.execute(
-        """
-        UPDATE permissions
-        SET allow=?, status=?, scope=?, expires_at=?, updated_at=?
-        WHERE dataset_id=? AND org_id=?
-        """,
-        (int(allow), status, scope, expires_at, NOW(), dataset_id, org_id),
+
+def _upsert_permissions(
+    conn: sqlite3.Connection,
+    rows: List[Tuple[int, int, int, str, Optional[str], Optional[str]]],
+) -> None:
+    """Batch form of _upsert_permission: rows are (dataset_id, org_id, allow, status, scope, expires_at)."""
+    if not rows:
+        return
+    ts = NOW()
+    conn.executemany(
+        _UPSERT_PERMISSION_SQL,
+        [(ds, org, int(allow), scope, exp, status, ts, ts) for ds, org, allow, status, scope, exp in rows],
     )
 
 
@@ -122,6 +138,7 @@ def grant_access(
                   meta={"org_id": org_id, "scope": scope, "expires_at": expires_at}, conn=conn)
         log_event(dataset_id, owner_id, "user", "permissions_update",
                   meta={"op": "grant", "org_id": org_id}, conn=conn)
+    invalidate_access_cache()  # after commit, so no reader re-caches the old grant
 
 def revoke_access(
     *,
@@ -136,6 +153,7 @@ def revoke_access(
                   meta={"org_id": org_id}, conn=conn)
         log_event(dataset_id, owner_id, "user", "permissions_update",
                   meta={"op": "revoke", "org_id": org_id}, conn=conn)
+    invalidate_access_cache()
 
 def update_permission_details(
     *,
@@ -155,6 +173,7 @@ def update_permission_details(
             meta={"op": "update_details", "org_id": org_id, "scope": scope, "expires_at": expires_at},
             conn=conn,
         )
+    invalidate_access_cache()
 
 
 # ---------------------------------------------------------------------
@@ -177,6 +196,9 @@ def set_trusted_orgs(
     default_scope = _sanitize_scope(default_scope)
 
     with get_conn() as conn:
+        # Take the write lock before reading current state, so no other writer
+        # can change it between the diff and the writes (no lock upgrade).
+        conn.execute("BEGIN IMMEDIATE")
         current = set(oid for (oid,) in conn.execute(
             "SELECT org_id FROM permissions WHERE dataset_id=? AND allow=1 AND status='granted'",
             (dataset_id,),
@@ -186,22 +208,27 @@ def set_trusted_orgs(
         added = sorted(list(desired - current))
         removed = sorted(list(current - desired))
 
-        for org_id in added:
-            _upsert_permission(conn, dataset_id, org_id, allow=1, status="granted",
-                               scope=default_scope, expires_at=default_expires_at)
-            log_event(dataset_id, owner_id, "user", "grant",
-                      meta={"org_id": org_id, "scope": default_scope, "expires_at": default_expires_at}, conn=conn)
-            log_event(dataset_id, owner_id, "user", "permissions_update",
-                      meta={"op": "grant", "org_id": org_id}, conn=conn)
+        # One executemany per statement instead of per-org round trips
+        _upsert_permissions(
+            conn,
+            [(dataset_id, oid, 1, "granted", default_scope, default_expires_at) for oid in added]
+            + [(dataset_id, oid, 0, "revoked", None, None) for oid in removed],
+        )
 
+        events = []
+        for org_id in added:
+            events.append((dataset_id, owner_id, "user", "grant",
+                           {"org_id": org_id, "scope": default_scope, "expires_at": default_expires_at}))
+            events.append((dataset_id, owner_id, "user", "permissions_update",
+                           {"op": "grant", "org_id": org_id}))
         for org_id in removed:
-            _upsert_permission(conn, dataset_id, org_id, allow=0, status="revoked")
-            log_event(dataset_id, owner_id, "user", "revoke",
-                      meta={"org_id": org_id}, conn=conn)
-            log_event(dataset_id, owner_id, "user", "permissions_update",
-                      meta={"op": "revoke", "org_id": org_id}, conn=conn)
+            events.append((dataset_id, owner_id, "user", "revoke", {"org_id": org_id}))
+            events.append((dataset_id, owner_id, "user", "permissions_update",
+                           {"op": "revoke", "org_id": org_id}))
+        log_events(events, conn=conn)
 
-        return {"added": added, "removed": removed}
+    invalidate_access_cache()
+    return {"added": added, "removed": removed}
 
 
 # ---------------------------------------------------------------------
@@ -224,6 +251,7 @@ def request_access(*, dataset_id: int, org_id: int, message: Optional[str] = Non
             meta={"message": msg},
             conn=conn,
         )
+    invalidate_access_cache()
 
 def list_my_requests(org_id: int) -> List[Tuple[int, str, int, str, str]]:
     """
@@ -271,12 +299,14 @@ def approve_request(
     """
     scope = _sanitize_scope(scope)
     with get_conn() as conn:
+        conn.execute("BEGIN IMMEDIATE")  # serialize concurrent reviewers up front
         _upsert_permission(conn, dataset_id, org_id, allow=1, status="granted",
                            scope=scope, expires_at=expires_at)
         log_event(dataset_id, owner_id, "user", "grant",
                   meta={"org_id": org_id, "scope": scope, "expires_at": expires_at}, conn=conn)
         log_event(dataset_id, owner_id, "user", "permissions_update",
                   meta={"op": "approve_request", "org_id": org_id}, conn=conn)
+    invalidate_access_cache()
 
 def deny_request(
     *,
@@ -291,8 +321,10 @@ def deny_request(
     """
     reason = (reason or "").strip()
     with get_conn() as conn:
+        conn.execute("BEGIN IMMEDIATE")
         _upsert_permission(conn, dataset_id, org_id, allow=0, status="revoked")
         log_event(dataset_id, owner_id, "user", "denied",
                   meta={"org_id": org_id, "reason": reason}, conn=conn)
         log_event(dataset_id, owner_id, "user", "permissions_update",
                   meta={"op": "deny_request", "org_id": org_id}, conn=conn)
+    invalidate_access_cache()
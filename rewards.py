@@ -4,10 +4,11 @@ from __future__ import annotations
 import json
 import time
 import sqlite3
-from typing import Optional, Mapping, Any
+from functools import lru_cache
+from typing import Optional, Mapping, Any, Iterable
 
 from db import get_conn
-from audit import log_reward_credited
+from audit import log_reward_credited, log_events
 
 NOW   = lambda: time.strftime("%Y-%m-%d %H:%M:%S")
 TODAY = lambda: time.strftime("%Y-%m-%d")
@@ -17,27 +18,181 @@ TODAY = lambda: time.strftime("%Y-%m-%d")
 def _cols(conn: sqlite3.Connection, table: str) -> set[str]:
     return {r[1] for r in conn.execute(f"PRAGMA table_info({table})").fetchall()}
 
+# (schema_version, table) -> column names; PRAGMA table_info runs only after
+# an actual schema change bumps the version.
+_SCHEMA_CACHE: dict[tuple[int, str], frozenset[str]] = {}
+
+def _cols_cached(conn: sqlite3.Connection, table: str, version: Optional[int] = None) -> frozenset[str]:
+    if version is None:
+        version = conn.execute("PRAGMA schema_version").fetchone()[0]
+    cols = _SCHEMA_CACHE.get((version, table))
+    if cols is None:
+        cols = _SCHEMA_CACHE[(version, table)] = frozenset(_cols(conn, table))
+    return cols
+
+def _as_json(meta) -> str:
+    """meta as compact JSON; an already-serialized string passes through."""
+    if isinstance(meta, str):
+        return meta
+    return json.dumps(dict(meta or {}), separators=(",", ":"))
+
+@lru_cache(maxsize=256)
+def _meta_json(purpose: str, mode: str) -> str:
+    """Serialized access-reward meta; (purpose, mode) pairs repeat constantly."""
+    return json.dumps({"purpose": purpose, "mode": mode}, separators=(",", ":"))
+
+def _credit_log_meta(org_id, amount, unit, reason, meta) -> dict:
+    """access_logs meta for a credit: core fields, then the caller's meta."""
+    m = {"org_id": org_id, "amount": amount, "unit": unit, "reason": reason}
+    if meta:
+        m.update(json.loads(meta) if isinstance(meta, str) else meta)
+    return m
+
+# Dataset ownership never changes after upload (no code path updates
+# datasets.owner_id or deletes datasets), so owners are cached per process.
+# Misses aren't cached: a dataset may be created after a failed lookup.
+_OWNER_CACHE: dict[int, int] = {}
+_OWNER_CACHE_SIZE = 4096
+_SQL_DATASET_OWNER = "SELECT owner_id FROM datasets WHERE id=?"
+
 def _owner_id_for_dataset(conn: sqlite3.Connection, dataset_id: int) -> int:
-    row = conn.execute("SELECT owner_id FROM datasets WHERE id=?", (dataset_id,)).fetchone()
+    owner_id = _OWNER_CACHE.get(dataset_id)
+    if owner_id is not None:
+        return owner_id
+    row = conn.execute(_SQL_DATASET_OWNER, (dataset_id,)).fetchone()
     if not row:
         raise FileNotFoundError("Dataset not found")
-    return int(row[0])
+    if len(_OWNER_CACHE) >= _OWNER_CACHE_SIZE:
+        _OWNER_CACHE.clear()
+    owner_id = _OWNER_CACHE[dataset_id] = int(row[0])
+    return owner_id
+
+# Timestamps in the static SQL below are stamped by SQLite with
+# datetime('now', 'localtime'): the same local "YYYY-MM-DD HH:MM:SS" text as
+# NOW(), without a bound parameter or a strftime call per row.
+_SQL_NOW = "datetime('now', 'localtime')"
+
+# ---------- schema snapshot ------------------------------------------
+# The rewards table has two shapes (db_init vs the migration script) and is
+# fixed once the app is running, so the insert/dedup SQL is chosen once per
+# schema_version instead of introspecting PRAGMA table_info on every credit.
+
+_SQL_INSERT_A = f"""
+    INSERT INTO rewards(dataset_id, org_id, owner_id, amount_cents, reason, created_at)
+    VALUES(?,?,?,?,?,{_SQL_NOW})
+"""
+
+_SQL_INSERT_B = f"""
+    INSERT INTO rewards(owner_id, org_id, dataset_id, amount, unit, reason, meta, at)
+    VALUES(?,?,?,?,?,?,?,{_SQL_NOW})
+"""
+
+def _insert_a(conn, dataset_id, org_id, owner_id, amount, unit, reason, meta) -> None:
+    # Schema A (db_init.py)
+    conn.execute(_SQL_INSERT_A, (dataset_id, org_id, owner_id, int(amount), reason))
+
+def _insert_b(conn, dataset_id, org_id, owner_id, amount, unit, reason, meta) -> None:
+    # Schema B (migration)
+    conn.execute(_SQL_INSERT_B, (owner_id, org_id, dataset_id, int(amount), unit, reason, _as_json(meta)))
+
+def _fallback_inserter(cols: frozenset[str]):
+    """Best-effort inserter for some custom schema, with its SQL built once."""
+    # Prefer columns we know exist
+    fields = ["dataset_id", "org_id", "owner_id"]
+    fields += [c for c in ("amount", "amount_cents", "unit", "reason", "meta", "at") if c in cols]
+    if "created_at" in cols and "at" not in cols:
+        fields.append("created_at")
+    q = f"INSERT INTO rewards({', '.join(fields)}) VALUES({', '.join(['?'] * len(fields))})"
+
+    def insert(conn, dataset_id, org_id, owner_id, amount, unit, reason, meta) -> None:
+        now = NOW()
+        values = {
+            "dataset_id": dataset_id, "org_id": org_id, "owner_id": owner_id,
+            "amount": int(amount), "amount_cents": int(amount), "unit": unit, "reason": reason,
+            "meta": _as_json(meta),
+            "at": now, "created_at": now,
+        }
+        conn.execute(q, tuple(values[f] for f in fields))
+
+    return insert
+
+# Daily-claim variants: owner_id comes from datasets inside the INSERT and the
+# uniq_rewards_daily index (db_init.ensure_rewards_daily_index) turns a repeat
+# claim into a no-op; RETURNING yields the owner only when a row was written.
+_SQL_CLAIM_A = f"""
+    INSERT INTO rewards(dataset_id, org_id, owner_id, amount_cents, reason, created_at)
+    SELECT d.id, ?, d.owner_id, ?, ?, {_SQL_NOW} FROM datasets d WHERE d.id=?
+    ON CONFLICT DO NOTHING
+    RETURNING owner_id
+"""
+
+_SQL_CLAIM_B = f"""
+    INSERT INTO rewards(owner_id, org_id, dataset_id, amount, unit, reason, meta, at)
+    SELECT d.owner_id, ?, d.id, ?, ?, ?, ?, {_SQL_NOW} FROM datasets d WHERE d.id=?
+    ON CONFLICT DO NOTHING
+    RETURNING owner_id
+"""
+
+def _claim_a(conn, dataset_id, org_id, amount, unit, reason, meta) -> Optional[int]:
+    row = conn.execute(_SQL_CLAIM_A, (org_id, int(amount), reason, dataset_id)).fetchone()
+    return row[0] if row else None
+
+def _claim_b(conn, dataset_id, org_id, amount, unit, reason, meta) -> Optional[int]:
+    row = conn.execute(_SQL_CLAIM_B, (org_id, int(amount), unit, reason, _as_json(meta), dataset_id)).fetchone()
+    return row[0] if row else None
+
+# Daily dedup probe, one fully-formed statement per date column. NOW() stamps
+# local time, so the day is compared in local time (matches idx_rewards_dedup).
+_SQL_DEDUP = {
+    date_col: f"""
+    SELECT 1 FROM rewards
+    WHERE dataset_id=? AND org_id=? AND DATE({date_col}) = DATE('now', 'localtime')
+    LIMIT 1
+"""
+    for date_col in ("at", "created_at")
+}
+
+_REWARDS_PLANS: dict[int, tuple] = {}
+
+def _rewards_plan(conn: sqlite3.Connection) -> tuple:
+    """
+    (inserter, dedup_sql or None, daily claimer or None) for the current
+    rewards schema. The claimer needs schema A/B and the uniq_rewards_daily index.
+    """
+    version = conn.execute("PRAGMA schema_version").fetchone()[0]
+    plan = _REWARDS_PLANS.get(version)
+    if plan is None:
+        cols = _cols_cached(conn, "rewards", version)
+        if "amount_cents" in cols:
+            insert = _insert_a
+        elif {"amount", "unit", "meta", "at"} <= cols:
+            insert = _insert_b
+        else:
+            insert = _fallback_inserter(cols)
+
+        # date column name differs by schema
+        date_col = "at" if "at" in cols else ("created_at" if "created_at" in cols else None)
+        dedup_sql = _SQL_DEDUP.get(date_col)
 
-def _has_credit_today(conn: sqlite3.Connection, *, dataset_id: int, org_id: int) -> bool:
-    cols = _cols(conn, "rewards")
-    # date column name differs by schema
-    date_col = "at" if "at" in cols else ("created_at" if "created_at" in cols else None)
-    if not date_col:
+        claim = None
+        has_daily_index = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='index' AND name='uniq_rewards_daily'"
+        ).fetchone()
+        if has_daily_index and insert is _insert_a:
+            claim = _claim_a
+        elif has_daily_index and insert is _insert_b:
+            claim = _claim_b
+        plan = _REWARDS_PLANS[version] = (insert, dedup_sql, claim)
+    return plan
+
+def _has_credit_today(
+    conn: sqlite3.Connection, *, dataset_id: int, org_id: int, plan: Optional[tuple] = None
+) -> bool:
+    _, dedup_sql, _ = plan or _rewards_plan(conn)
+    if not dedup_sql:
         # unknown custom schema -> don't dedup, but avoid crash
         return False
-    row = conn.execute(
-        f"""
-        SELECT 1 FROM rewards
-        WHERE dataset_id=? AND org_id=? AND DATE({date_col}) = DATE('now')
-        LIMIT 1
-        """,
-        (dataset_id, org_id),
-    ).fetchone()
+    row = conn.execute(dedup_sql, (dataset_id, org_id)).fetchone()
     return row is not None
 
 # ---------- write (schema-adaptive) ---------------------------------
@@ -52,72 +207,30 @@ def _insert_reward(
     unit: str,
     reason: str,
     meta: Optional[Mapping[str, Any]] = None,
+    plan: Optional[tuple] = None,
 ) -> None:
     """
     Inserts a reward row compatible with either schema:
     - Schema A (db_init.py):  id, dataset_id, org_id, owner_id, amount_cents, reason, created_at
     - Schema B (migration script): id, owner_id, org_id, dataset_id, amount, unit, reason, meta, at
+    Pass `plan` when the caller already holds _rewards_plan(conn).
     """
-    cols = _cols(conn, "rewards")
-
-    if "amount_cents" in cols:
-        # Schema A (db_init.py)
-        conn.execute(
-            """
-            INSERT INTO rewards(dataset_id, org_id, owner_id, amount_cents, reason, created_at)
-            VALUES(?,?,?,?,?,?)
-            """,
-            (dataset_id, org_id, owner_id, int(amount), reason, NOW()),
-        )
-    else:
-        # Schema B (migration)
-        meta_json = json.dumps(dict(meta or {}), separators=(",", ":"))
-        # ensure required columns exist
-        has_meta = "meta" in cols
-        has_unit = "unit" in cols
-        has_at   = "at" in cols
-
-        if has_meta and has_unit and has_at and "amount" in cols:
-            conn.execute(
-                """
-                INSERT INTO rewards(owner_id, org_id, dataset_id, amount, unit, reason, meta, at)
-                VALUES(?,?,?,?,?,?,?,?)
-                """,
-                (owner_id, org_id, dataset_id, int(amount), unit, reason, meta_json, NOW()),
-            )
-        else:
-            # Fallback minimal insert (some custom schema) — try best effort
-            # Prefer columns we know exist
-            fields = ["dataset_id", "org_id", "owner_id"]
-            values = [dataset_id, org_id, owner_id]
-            if "amount" in cols:
-                fields.append("amount"); values.append(int(amount))
-            if "amount_cents" in cols:
-                fields.append("amount_cents"); values.append(int(amount))
-            if "unit" in cols:
-                fields.append("unit"); values.append(unit)
-            if "reason" in cols:
-                fields.append("reason"); values.append(reason)
-            if "meta" in cols:
-                fields.append("meta"); values.append(meta_json)
-            if "at" in cols:
-                fields.append("at"); values.append(NOW())
-            if "created_at" in cols and "at" not in cols:
-                fields.append("created_at"); values.append(NOW())
-
-            q = f"INSERT INTO rewards({', '.join(fields)}) VALUES({', '.join(['?']*len(values))})"
-            conn.execute(q, tuple(values))
+    insert, _, _ = plan or _rewards_plan(conn)
+    insert(conn, dataset_id, org_id, owner_id, amount, unit, reason, meta)
 
     # mirror to access_logs
     log_reward_credited(
         dataset_id=dataset_id,
         actor_id=owner_id,  # attribute to owner/admin for the credit event
-        meta={"org_id": org_id, "amount": amount, "unit": unit, "reason": reason, **(meta or {})},
+        meta=_credit_log_meta(org_id, amount, unit, reason, meta),
         conn=conn,
     )
 
 # ---------- public API ----------------------------------------------
 
+# grant modes that earn the owner a credit when an org accesses the dataset
+REWARDED_MODES = frozenset({"trusted", "public"})
+
 def credit_reward(
     conn: sqlite3.Connection,
     *,
@@ -140,6 +253,60 @@ def credit_reward(
         meta=meta or {},
     )
 
+def credit_rewards_bulk(
+    conn: sqlite3.Connection,
+    *,
+    rows: Iterable[Mapping[str, Any]],
+) -> int:
+    """
+    Credit many rewards at once. Each row needs dataset_id, owner_id, org_id
+    and may set amount (1), unit ("credit"), reason ("") and meta ({}).
+    Schemas A and B insert with one executemany; the audit mirrors are
+    written with one more. Returns the number of rows credited.
+
+    meta may be a mapping or an already-serialized JSON string (as with
+    credit_reward). Reasons starting with 'org_access:' are refused with
+    ValueError before anything is written: those are the daily access credits
+    guarded by uniq_rewards_daily and belong to trigger_reward_on_access;
+    a duplicate would otherwise fail the whole executemany.
+    """
+    items = [
+        (r["dataset_id"], r["org_id"], r["owner_id"], int(r.get("amount", 1)),
+         r.get("unit") or "credit", r.get("reason") or "", r.get("meta") or {})
+        for r in rows
+    ]
+    if not items:
+        return 0
+    bad = [reason for *_, reason, _meta in items if reason.startswith("org_access:")]
+    if bad:
+        raise ValueError(f"credit_rewards_bulk can't credit daily access rewards: {bad[0]!r}")
+
+    insert, _, _ = _rewards_plan(conn)
+    if insert is _insert_a:
+        conn.executemany(_SQL_INSERT_A, [
+            (ds, org, owner, amount, reason)
+            for ds, org, owner, amount, unit, reason, meta in items
+        ])
+    elif insert is _insert_b:
+        conn.executemany(_SQL_INSERT_B, [
+            (owner, org, ds, amount, unit, reason, _as_json(meta))
+            for ds, org, owner, amount, unit, reason, meta in items
+        ])
+    else:
+        for ds, org, owner, amount, unit, reason, meta in items:
+            insert(conn, ds, org, owner, amount, unit, reason, meta)
+
+    # mirror to access_logs (same shape as _insert_reward's)
+    log_events(
+        [
+            (ds, owner, "admin", "reward_credited",
+             _credit_log_meta(org, amount, unit, reason, meta))
+            for ds, org, owner, amount, unit, reason, meta in items
+        ],
+        conn=conn,
+    )
+    return len(items)
+
 def trigger_reward_on_access(
     conn: sqlite3.Connection,
     *,
@@ -153,27 +320,49 @@ def trigger_reward_on_access(
     Reward policy (prototype):
       - Reward only when the accessor is an ORG.
       - One credit per (org, dataset) per calendar day.
-      - Applies when access mode is 'trusted' or 'public'.
+      - Applies when access mode is in REWARDED_MODES ('trusted', 'public').
     """
-    if not actor_id or (actor_role or "").lower() != "org":
+    # cheap in-memory checks first: non-org or non-rewarded access never
+    # touches the database
+    if not actor_id or not grant or (actor_role or "").lower() != "org":
+        return
+    mode = grant.get("mode")
+    if mode not in REWARDED_MODES:
         return
 
-    mode = (grant or {}).get("mode", "")
-    if mode not in ("trusted", "public"):
+    purpose = purpose or "download"
+    reason = f"org_access:{mode}"
+    meta = {"purpose": purpose, "mode": mode}
+
+    # one schema_version check for the whole call; the plan is threaded below
+    plan = _rewards_plan(conn)
+    _, _, claim = plan
+    if claim is not None:
+        # One statement: owner lookup, daily dedup and insert
+        owner_id = claim(conn, dataset_id, actor_id, 1, "credit", reason,
+                         _meta_json(purpose, mode))
+        if owner_id is not None:
+            log_reward_credited(
+                dataset_id=dataset_id,
+                actor_id=owner_id,
+                meta=_credit_log_meta(actor_id, 1, "credit", reason, meta),
+                conn=conn,
+            )
         return
 
-    if _has_credit_today(conn, dataset_id=dataset_id, org_id=actor_id):
+    if _has_credit_today(conn, dataset_id=dataset_id, org_id=actor_id, plan=plan):
         return
 
     owner_id = _owner_id_for_dataset(conn, dataset_id)
 
-    credit_reward(
+    _insert_reward(
         conn,
         dataset_id=dataset_id,
         owner_id=owner_id,
         org_id=actor_id,
         amount=1,                # if your schema uses amount_cents, this will just write "1"
         unit="credit",
-        reason=f"org_access:{mode}",
-        meta={"purpose": purpose or "download", "mode": mode},
+        reason=reason,
+        meta=meta,
+        plan=plan,
     )
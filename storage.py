@@ -14,13 +14,20 @@ list_versions(owner_id: int, name: str)
     -> List[(id, version, visibility, created_at)]
 
 change_visibility(owner_id: int, dataset_id: int, new_visibility: str) -> bool
+    False when not owner / not found; raises VisibilityConflictError if a
+    concurrent change keeps winning the compare-and-set.
 
 get_dataset_bytes(dataset_id: int) -> bytes
     Raw decrypt without permission checks (owner/admin utilities)
 
 get_dataset_for_download(dataset_id: int, actor_id: int|None, actor_role: str|None, purpose="download")
     -> (bytes, filename, mime)
-    Permission-checked & audited (download / denied) and triggers rewards.
+    Permission-checked & audited (download / denied) and triggers rewards;
+    the download audit and reward are written behind by a background thread.
+
+get_dataset_stream_for_download(dataset_id: int, actor_id: int|None, actor_role: str|None, purpose="download")
+    -> (Iterator[bytes], filename, mime, size_bytes|None)
+    Same checks and audit, then yields decrypted chunks instead of one buffer.
 
 get_dataset_bytes_secure(dataset_id: int, actor_id: int|None, actor_role: str|None, purpose="download")
     -> bytes  (thin wrapper around get_dataset_for_download)
@@ -28,45 +35,98 @@ get_dataset_bytes_secure(dataset_id: int, actor_id: int|None, actor_role: str|No
 
 from __future__ import annotations
 
-import time
-from typing import List, Tuple, Optional
+import logging
+import sqlite3
+from typing import Iterator, List, Tuple, Optional
 
 from db import get_conn
 from filesec import encrypt_bytes, decrypt_bytes
-from access import can_access
+from access import can_access_cached, invalidate_access_cache
 from rewards import trigger_reward_on_access
 from audit import (
+    ALLOWED_ROLES,
+    AuditBatcher,
     log_upload,
     log_permissions_update,
-    log_download,
+    log_events,
     log_denied,
 )
 
 # ---------------------- constants / utils ----------------------
 
-NOW = lambda: time.strftime("%Y-%m-%d %H:%M:%S")
-
 ALLOWED_VIS = {"Private", "Trusted", "Public"}
 DEFAULT_MIME = "application/octet-stream"
+CHUNK_SIZE = 1 << 20  # plaintext bytes per dataset_chunks row
 
 
 def _bytes_from_blob(blob) -> bytes:
-    """Normalize SQLite BLOB (bytes or memoryview) to bytes."""
+    """
+    Normalize SQLite BLOB (bytes or memoryview) to bytes.
+    sqlite3 already returns bytes, which pass through without a copy; a
+    memoryview must still be converted because Fernet.decrypt only accepts
+    bytes or str.
+    """
     if isinstance(blob, memoryview):
         return blob.tobytes()
     return blob
 
 
-def _next_version(conn, owner_id: int, name: str) -> int:
-    row = conn.execute(
-        "SELECT COALESCE(MAX(version), 0) FROM datasets WHERE owner_id=? AND name=?",
-        (owner_id, name),
-    ).fetchone()
-    return int(row[0]) + 1
+# Static SQL lives in module constants so each statement is one string that
+# sqlite3's per-connection statement cache (db.get_conn: 256 entries) reuses.
+_SQL_GET_BYTES = "SELECT content_enc FROM datasets WHERE id=?"
+_SQL_GET_CHUNKS = "SELECT content_enc FROM dataset_chunks WHERE dataset_id=? ORDER BY seq"
+
+
+def _read_ciphertext(conn, dataset_id: int) -> bytes:
+    """
+    content_enc for dataset_id. On Python 3.11+ this uses SQLite's incremental
+    BLOB I/O, which reads straight into one bytes object instead of copying
+    the whole ciphertext through a result row first.
+    """
+    if hasattr(conn, "blobopen"):
+        try:
+            with conn.blobopen("datasets", "content_enc", dataset_id, readonly=True) as blob:
+                return blob.read()
+        except sqlite3.OperationalError:
+            pass  # missing row / NULL content: let the SELECT below decide
+    row = conn.execute(_SQL_GET_BYTES, (dataset_id,)).fetchone()
+    if not row or row[0] is None:
+        raise FileNotFoundError("Dataset not found")
+    return _bytes_from_blob(row[0])
+
+
+def _iter_plaintext(conn, dataset_id: int) -> Iterator[bytes]:
+    """
+    Decrypted content of dataset_id, one dataset_chunks row at a time for
+    chunked uploads, else the single content_enc ciphertext (older rows).
+    """
+    chunks = conn.execute(_SQL_GET_CHUNKS, (dataset_id,))
+    any_chunk = False
+    for (enc,) in chunks:
+        any_chunk = True
+        yield decrypt_bytes(_bytes_from_blob(enc))
+    if not any_chunk:
+        yield decrypt_bytes(_read_ciphertext(conn, dataset_id))
+
+
+def _read_plaintext(conn, dataset_id: int) -> bytes:
+    return b"".join(_iter_plaintext(conn, dataset_id))
 
 
 # ---------------------- write paths ----------------------
 
+# Next version computed inside the INSERT (one statement, no separate
+# MAX(version) round trip); RETURNING hands back both keys.
+_SQL_INSERT_DATASET = """
+    INSERT INTO datasets(owner_id, name, description, mime, content_enc, size_bytes, visibility, version, created_at)
+    VALUES(?,?,?,?,?,?,?,
+           COALESCE((SELECT MAX(version) FROM datasets WHERE owner_id=? AND name=?), 0) + 1,
+           datetime('now', 'localtime'))
+    RETURNING id, version
+"""
+
+_SQL_INSERT_CHUNK = "INSERT INTO dataset_chunks(dataset_id, seq, content_enc) VALUES(?,?,?)"
+
 def save_dataset(
     *,
     owner_id: int,
@@ -90,19 +150,28 @@ def save_dataset(
     m = (mime or DEFAULT_MIME).strip() or DEFAULT_MIME
     desc = (description or "").strip()
 
-    # Encrypt payload before write
-    ciphertext = encrypt_bytes(raw_bytes)
+    # Encrypt before taking the write lock: Fernet over a large file is the slow
+    # part, and holding BEGIN IMMEDIATE through it would stall every other
+    # writer (audit batcher, permissions, rewards). Costs one ciphertext copy.
+    view = memoryview(raw_bytes)
+    chunks = [
+        encrypt_bytes(bytes(view[off:off + CHUNK_SIZE]))
+        for off in range(0, max(len(view), 1), CHUNK_SIZE)
+    ]
 
     with get_conn() as conn:
-        ver = _next_version(conn, owner_id, file_name)
-        cur = conn.execute(
-            """
-            INSERT INTO datasets(owner_id, name, description, mime, content_enc, visibility, version, created_at)
-            VALUES(?,?,?,?,?,?,?,?)
-            """,
-            (owner_id, file_name, desc, m, ciphertext, vis, ver, NOW()),
+        # Lock held only for the dataset row, its chunks and the audit entry.
+        conn.execute("BEGIN IMMEDIATE")
+        ds_id, ver = conn.execute(
+            _SQL_INSERT_DATASET,
+            (owner_id, file_name, desc, m, b"", len(raw_bytes), vis, owner_id, file_name),
+        ).fetchone()
+
+        # content_enc stays empty; the ciphertext lives in dataset_chunks
+        conn.executemany(
+            _SQL_INSERT_CHUNK,
+            ((ds_id, seq, enc) for seq, enc in enumerate(chunks)),
         )
-        ds_id = int(cur.lastrowid)
 
         # Audit: upload
         log_upload(
@@ -117,27 +186,37 @@ def save_dataset(
 
 # ---------------------- listings ----------------------
 
+# One pass over idx_datasets_owner_name_ver_desc instead of a correlated
+# MAX(version) probe per row; version is unique per (owner_id, name), so it
+# alone orders each partition
+_SQL_LIST_LATEST = """
+    SELECT id, name, version, visibility, created_at
+    FROM (
+        SELECT id, name, version, visibility, created_at,
+               ROW_NUMBER() OVER (PARTITION BY name ORDER BY version DESC) AS rn
+        FROM datasets
+        WHERE owner_id = ?
+    )
+    WHERE rn = 1
+    ORDER BY created_at DESC, id DESC
+    LIMIT ?
+"""
+
+_SQL_LIST_VERSIONS = """
+    SELECT id, version, visibility, created_at
+    FROM datasets
+    WHERE owner_id=? AND name=?
+    ORDER BY version DESC, id DESC
+"""
+
+
 def list_my_latest(owner_id: int, limit: int = 25) -> List[Tuple[int, str, int, str, str]]:
     """
     Latest version of each filename for the owner.
     Returns list of (id, name, version, visibility, created_at), newest first.
     """
     with get_conn() as conn:
-        rows = conn.execute(
-            """
-            SELECT d.id, d.name, d.version, d.visibility, d.created_at
-            FROM datasets d
-            WHERE d.owner_id = ?
-              AND d.version = (
-                  SELECT MAX(d2.version)
-                  FROM datasets d2
-                  WHERE d2.owner_id = d.owner_id AND d2.name = d.name
-              )
-            ORDER BY d.created_at DESC, d.id DESC
-            LIMIT ?
-            """,
-            (owner_id, limit),
-        ).fetchall()
+        rows = conn.execute(_SQL_LIST_LATEST, (owner_id, limit)).fetchall()
     return rows
 
 
@@ -147,24 +226,27 @@ def list_versions(owner_id: int, name: str) -> List[Tuple[int, int, str, str]]:
     Returns (id, version, visibility, created_at) newest first.
     """
     with get_conn() as conn:
-        rows = conn.execute(
-            """
-            SELECT id, version, visibility, created_at
-            FROM datasets
-            WHERE owner_id=? AND name=?
-            ORDER BY version DESC, id DESC
-            """,
-            (owner_id, name),
-        ).fetchall()
+        rows = conn.execute(_SQL_LIST_VERSIONS, (owner_id, name)).fetchall()
     return rows
 
 
 # ---------------------- updates ----------------------
 
+class VisibilityConflictError(RuntimeError):
+    """change_visibility lost a race with another writer on the same dataset."""
+
+
+_SQL_CHANGE_VIS_SELECT = "SELECT visibility FROM datasets WHERE id=? AND owner_id=?"
+_SQL_CHANGE_VIS_UPDATE = (
+    "UPDATE datasets SET visibility=?, updated_at=datetime('now', 'localtime') "
+    "WHERE id=? AND visibility=?"
+)
+
 def change_visibility(*, owner_id: int, dataset_id: int, new_visibility: str) -> bool:
     """
     Change visibility for a dataset IF caller is owner.
-    Returns True if updated; False if not owner / not found / no change.
+    Returns True if updated or already set; False if not owner / not found.
+    Raises VisibilityConflictError if a concurrent change keeps winning.
     Audits as 'permissions_update' (op=set_visibility).
     """
     vis = (new_visibility or "").strip().title()
@@ -172,29 +254,37 @@ def change_visibility(*, owner_id: int, dataset_id: int, new_visibility: str) ->
         raise ValueError(f"Invalid visibility '{new_visibility}'. Allowed: {sorted(ALLOWED_VIS)}")
 
     with get_conn() as conn:
-        row = conn.execute(
-            "SELECT owner_id, visibility FROM datasets WHERE id=?",
-            (dataset_id,),
-        ).fetchone()
-        if not row:
-            return False
-        owner_row, old_vis = row
-        if owner_row != owner_id:
-            return False
-        if old_vis == vis:
-            return True  # no-op
-
-        conn.execute(
-            "UPDATE datasets SET visibility=?, updated_at=? WHERE id=?",
-            (vis, NOW(), dataset_id),
-        )
+        # Ownership is part of the lookup: not found and not owner are the same
+        # miss. (RETURNING reports post-update values, so the old visibility
+        # for the audit can't come back from the UPDATE itself.)
+        for _attempt in range(2):
+            row = conn.execute(_SQL_CHANGE_VIS_SELECT, (dataset_id, owner_id)).fetchone()
+            if not row:
+                return False
+            old_vis = row[0]
+            if old_vis == vis:
+                return True  # no-op
+
+            # Compare-and-set on the value just read, so the audit's 'old' is
+            # never stale. If another writer got in between, re-read and try
+            # again: the failed UPDATE already opened our write transaction,
+            # so the second attempt can't be overtaken.
+            cur = conn.execute(_SQL_CHANGE_VIS_UPDATE, (vis, dataset_id, old_vis))
+            if cur.rowcount == 1:
+                break
+        else:
+            raise VisibilityConflictError(
+                "Visibility was changed concurrently; reload and try again."
+            )
         log_permissions_update(
             dataset_id=dataset_id,
             actor_id=owner_id,
             meta={"op": "set_visibility", "old": old_vis, "new": vis},
             conn=conn,
         )
-        return True
+    # after commit: a reader that saw the old row can't re-cache it
+    invalidate_access_cache()
+    return True
 
 
 # ---------------------- reads (unsafe & safe) ----------------------
@@ -205,78 +295,136 @@ def get_dataset_bytes(dataset_id: int) -> bytes:
     Prefer get_dataset_for_download(...) for user-facing access.
     """
     with get_conn() as conn:
-        row = conn.execute(
-            "SELECT content_enc FROM datasets WHERE id=?",
-            (dataset_id,),
-        ).fetchone()
-        if not row:
-            raise FileNotFoundError("Dataset not found")
-        enc = _bytes_from_blob(row[0])
-    return decrypt_bytes(enc)
-
-
-def get_dataset_for_download(
-    dataset_id: int,
-    actor_id: Optional[int],
-    actor_role: Optional[str],
-    purpose: str = "download",
-):
-    """
-    Secure fetch with audit and rewards:
-    - checks permission (Private/Trusted/Public, owner/admin overrides)
-    - if denied: logs 'denied' and raises PermissionError
-    - if allowed: decrypts bytes, logs 'download',
-      triggers reward for org access, and returns (bytes, filename, mime)
-    """
-    with get_conn() as conn:
-        allowed, reason, grant = can_access(
-            dataset_id=dataset_id,
-            actor_id=actor_id,
-            actor_role=actor_role,
-            purpose=purpose,
-            conn=conn,
-        )
+        return _read_plaintext(conn, dataset_id)
 
-        if not allowed:
-            log_denied(
-                dataset_id=dataset_id,
-                actor_id=actor_id or 0,
-                role=actor_role or "user",
-                meta={"reason": reason, "purpose": purpose},
-                conn=conn,
-            )
-            raise PermissionError(f"Access denied: {reason}")
 
-        row = conn.execute(
-            "SELECT name, mime, content_enc FROM datasets WHERE id=?",
-            (dataset_id,),
-        ).fetchone()
-        if not row:
-            raise FileNotFoundError("Dataset not found")
+_SQL_GET_FOR_DOWNLOAD = "SELECT name, mime, size_bytes FROM datasets WHERE id=?"
 
-        name, mime, enc = row[0], (row[1] or DEFAULT_MIME), _bytes_from_blob(row[2])
-        data = decrypt_bytes(enc)
 
-        # Audit allowed download
-        log_download(
+def _authorize_download(conn, dataset_id, actor_id, actor_role, purpose):
+    """
+    Permission check for a download on `conn`. Logs 'denied' and raises
+    PermissionError when refused; returns (grant, name, mime, size_bytes).
+    """
+    allowed, reason, grant = can_access_cached(
+        dataset_id=dataset_id,
+        actor_id=actor_id,
+        actor_role=actor_role,
+        purpose=purpose,
+        conn=conn,
+    )
+
+    if not allowed:
+        log_denied(
             dataset_id=dataset_id,
             actor_id=actor_id or 0,
             role=actor_role or "user",
-            meta={"purpose": purpose, **(grant or {})},
+            meta={"reason": reason, "purpose": purpose},
             conn=conn,
         )
-
-        # Reward on org access (same transaction/connection)
+        raise PermissionError(f"Access denied: {reason}")
+
+    row = conn.execute(_SQL_GET_FOR_DOWNLOAD, (dataset_id,)).fetchone()
+    if not row:
+        raise FileNotFoundError("Dataset not found")
+
+    return grant, row[0], (row[1] or DEFAULT_MIME), row[2]
+
+
+def _flush_downloads(conn, items) -> None:
+    """AuditBatcher flush: one executemany for the 'download' rows, then rewards."""
+    log_events(
+        [
+            (dataset_id, actor_id or 0, role if role in ALLOWED_ROLES else "org",
+             "download", {"purpose": purpose, **grant})
+            for dataset_id, actor_id, role, purpose, grant in items
+        ],
+        conn=conn,
+    )
+    for dataset_id, actor_id, role, purpose, grant in items:
         trigger_reward_on_access(
             conn,
             dataset_id=dataset_id,
             actor_id=actor_id,
-            actor_role=actor_role,
+            actor_role=role,
             grant=grant,
             purpose=purpose,
         )
 
-        return data, name, mime
+
+_download_writer = AuditBatcher(_flush_downloads)
+
+
+def _record_download(dataset_id, actor_id, actor_role, purpose, grant) -> None:
+    """Queue the 'download' audit and org reward; written off the request path."""
+    _download_writer.enqueue(
+        (dataset_id, actor_id, actor_role or "user", purpose, dict(grant or {}))
+    )
+
+
+def get_dataset_for_download(
+    dataset_id: int,
+    actor_id: Optional[int],
+    actor_role: Optional[str],
+    purpose: str = "download",
+):
+    """
+    Secure fetch with audit and rewards:
+    - checks permission (Private/Trusted/Public, owner/admin overrides)
+    - if denied: logs 'denied' and raises PermissionError
+    - if allowed: decrypts bytes, queues the 'download' audit and the
+      org-access reward, and returns (bytes, filename, mime)
+
+    The audit/reward rows are written by a background writer shortly after
+    (see audit.AuditBatcher); nothing is queued if decryption fails.
+    """
+    with get_conn() as conn:
+        grant, name, mime, _ = _authorize_download(conn, dataset_id, actor_id, actor_role, purpose)
+        data = _read_plaintext(conn, dataset_id)
+    _record_download(dataset_id, actor_id, actor_role, purpose, grant)
+    return data, name, mime
+
+
+def get_dataset_stream_for_download(
+    dataset_id: int,
+    actor_id: Optional[int],
+    actor_role: Optional[str],
+    purpose: str = "download",
+):
+    """
+    Streaming variant of get_dataset_for_download for callers that can send
+    chunks as they come (e.g. an HTTP response) instead of holding the whole
+    plaintext. Returns (chunks, filename, mime, size_bytes); size_bytes is
+    None for datasets uploaded before sizes were recorded.
+
+    The permission check runs before this returns; the 'download' audit and
+    reward are queued for the background writer. The generator decrypts one
+    stored chunk at a time on its own connection; a failure mid-stream is
+    logged as 'denied' with reason 'stream_aborted' and re-raised.
+    """
+    with get_conn() as conn:
+        grant, name, mime, size = _authorize_download(conn, dataset_id, actor_id, actor_role, purpose)
+    _record_download(dataset_id, actor_id, actor_role, purpose, grant)
+
+    def _chunks() -> Iterator[bytes]:
+        try:
+            with get_conn() as conn:
+                yield from _iter_plaintext(conn, dataset_id)
+        except Exception:
+            # Best effort: if the audit write fails too (e.g. the database is
+            # locked, likely why the stream failed), keep the original error.
+            try:
+                log_denied(
+                    dataset_id=dataset_id,
+                    actor_id=actor_id or 0,
+                    role=actor_role or "user",
+                    meta={"reason": "stream_aborted", "purpose": purpose},
+                )
+            except Exception:
+                logging.getLogger(__name__).exception("could not log stream_aborted")
+            raise
+
+    return _chunks(), name, mime, size
 
 
 def get_dataset_bytes_secure(